@@ -1,106 +1,183 @@
-from pathlib import Path
-import json as js
-
-from cfnlint.api import lint_file, ManualArgs
-from utilities import severity_evaluation, find_line, create_path_for_coordinate_resources
+import lint_pool
+import metrics
+from json_encoding import dumps
+from utilities import severity_evaluation, create_path_for_coordinate_resources, match_property_name
+from template_parser import build_line_index
 
 
 
 #to run this code use py 3.11.0
 
 
-def lint_cloudformation_template(data):
-
-    file_path = Path(data)
+#lint the template straight from the request body on the pre-warmed lint pool,
+#nothing is written to disk. selection (lint_pool.rule_selection) limits the rules that run,
+#with several regions the template is decoded once and only the regional rules run per region.
+#a template cfn-lint can not decode raises lint_pool.TemplateDecodeError, the client sent it
+def lint_cloudformation_template(template, selection=None, regions=lint_pool.default_regions):
 
     try:
-        config_args = ManualArgs(
+        with metrics.stage("deepsearch", "lint"):
+            return lint_pool.lint_regions(template, tuple(regions), selection)
 
-            regions=["us-east-1"],
-        )
+    except lint_pool.TemplateDecodeError:
+        raise
+    except Exception as e:
+        print(f"An unexpected error occurred during linting: {e}")
+        return None
 
-        matches = lint_file(file_path, config=config_args)
 
-        filtered_matches = []
-        for match in matches:
+#mapping the severity values, matches without a severity are ordered last
+severity_values = {"High": 3, "Medium": 2, "Low": 1}
 
-            filtered_matches.append(match)
 
-        return filtered_matches
+def _resource_key(match, line_index):
+    return str(match.path[1]) if len(match.path) > 1 else ""
 
-    except Exception as e:
-        print(f"An unexpected error occurred during linting: {e}")
-        return None
 
+def _rule_key(match, line_index):
+    return match.rule.id
 
-def generate_deepsearch_result(lint_results: list):
 
-    grouped_output = {}
+#(line, column) of a match: the position cfn-lint decoded, or the line index of the
+#template for the matches without one
+def match_position(match, line_index):
+    if match.line is not None:
+        return (match.line, match.column or 0)
+    if line_index is not None:
+        return line_index.position(create_path_for_coordinate_resources(match.path))
+    return None
 
-    if lint_results is None:
-        return {"error": "Linting failed or returned no results."}
-    
-    #using bubble sort for ordering the values
-    n = len(lint_results)
-    
-    #mapping the severity values
-    severity_values = {"High" : 3, "Medium" : 2, "Low" : 1}
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            
-            #identiifyng the values
-            if len(lint_results[j].path) >= 4:
-                property_name_1 = severity_evaluation(str(lint_results[j].path[3]))
-                
-                #Add logic for number issue
-                if type(lint_results[j].path[3]) == int:
-                    lint_results[j].path[3] = "ListElementType"
-            else:
-                property_name_1 = severity_evaluation("UnknownProperty")
-                
-            if len(lint_results[j + 1].path) >= 4:
-                property_name_2 = severity_evaluation(str(lint_results[j + 1].path[3])) 
-            else:
-                property_name_2 = severity_evaluation("UnknownProperty")
-               
-            #swapping the values 
-            if (severity_values[property_name_1] < severity_values[property_name_2]):
-                temp_val = lint_results[j]
-                lint_results[j] = lint_results[j + 1]
-                lint_results[j + 1] = temp_val
-            
 
-    #creating info object
+def _line_key(match, line_index):
+    position = match_position(match, line_index)
+
+    #matches without a known position go after the ones with a line
+    if position is None:
+        return (1, 0, 0)
+    return (0, position[0], position[1])
+
+
+#secondary keys that can be used to order matches with the same severity
+ordering_keys = {
+    "resource": _resource_key,
+    "rule": _rule_key,
+    "line": _line_key,
+}
+
+
+#order the matches by severity (highest first) and then by the requested secondary keys
+#the severity of every match is computed once and the sort is stable, so matches that
+#compare equal keep the order cfn-lint returned them in
+def order_matches(lint_results, secondary_keys=(), line_index=None):
+
+    for key_name in secondary_keys:
+        if key_name not in ordering_keys:
+            raise ValueError(f"Unknown ordering key: {key_name}")
+
+    decorated = []
     for match in lint_results:
+        severity = severity_evaluation(match_property_name(match))
+        key = [-severity_values.get(severity, 0)]
+        for key_name in secondary_keys:
+            key.append(ordering_keys[key_name](match, line_index))
+
+        decorated.append((key, severity, match))
+
+    decorated.sort(key=lambda item: item[0])
+
+    return [(severity, match) for _, severity, match in decorated]
+
+
+#yield (resource name, property name, finding) for every match, in report order
+#template is the raw text that was linted, used to map every match to its line
+def iter_deepsearch_findings(lint_results, template, order_by=()):
+
+    #the template is only mapped again when cfn-lint did not place every match
+    line_index = None
+    if any(match.line is None for match in lint_results):
+        with metrics.stage("deepsearch", "source_mapping"):
+            line_index = build_line_index(template)
+
+    with metrics.stage("deepsearch", "severity_ordering"):
+        ordered_matches = order_matches(lint_results, order_by, line_index)
+
+    #creating info object
+    for severity, match in ordered_matches:
         if not match.path or len(match.path) < 2:
             continue
 
         resource_name = str(match.path[0])
+        property_name = match_property_name(match)
 
-        if len(match.path) >= 4:
-            property_name = str(match.path[3])        
-        else:
-            property_name = "UnknownProperty"
+        position = match_position(match, line_index)
 
-        path_to_calculate_line = create_path_for_coordinate_resources(match.path)
-        
         finding = {
-            "severity": severity_evaluation(str(property_name)),
+            "severity": severity,
             "message": match.message,
 
-            "path": str(find_line("./user_data/line_mapping.json", path_to_calculate_line)),
+            "path": f"{position[0] + 1}:{position[1]}" if position is not None else "not found",
             "rule_solution": match.rule.description,
         }
+        if match.regions is not None:
+            finding["regions"] = match.regions
+
+        yield resource_name, property_name, finding
+
+
+def generate_deepsearch_result(lint_results: list, template, order_by=()):
+
+    grouped_output = {}
+
+    if lint_results is None:
+        return {"error": "Linting failed or returned no results."}
+
+    findings = iter_deepsearch_findings(lint_results, template, order_by)
+
+    #the line of every finding is looked up while grouping
+    total = 0
+    with metrics.stage("deepsearch", "grouping"):
+        for resource_name, property_name, finding in findings:
+            total += 1
+
+            if resource_name not in grouped_output:
+                grouped_output[resource_name] = {}
+            if property_name not in grouped_output[resource_name]:
+                grouped_output[resource_name][property_name] = []
+
+            grouped_output[resource_name][property_name].append(finding)
+    metrics.findings_total.inc(total, endpoint="deepsearch")
+
+
+    with metrics.stage("deepsearch", "json_encode"):
+        return dumps(grouped_output)
+
+
+#error record of the stream
+def stream_error_record(message):
+    return dumps({"type": "error", "error": message}) + "\n"
+
+
+#newline delimited json version of the report: one record per finding as soon as it is
+#mapped, then a summary record, so the client can render while the rest is processed.
+#the template is linted when the first record is taken, a decode error is raised there
+def stream_deepsearch_result(template, order_by=(), selection=None, regions=lint_pool.default_regions):
+
+    lint_results = lint_cloudformation_template(template, selection, regions)
+
+    if lint_results is None:
+        yield stream_error_record("Linting failed or returned no results.")
+        return
 
-        if resource_name not in grouped_output:
-            grouped_output[resource_name] = {}
-        if property_name not in grouped_output[resource_name]:
-            grouped_output[resource_name][property_name] = []
-            
-        grouped_output[resource_name][property_name].append(finding)
+    severity_counts = {"High": 0, "Medium": 0, "Low": 0, "Unclassified": 0}
+    total = 0
 
-        
-    return js.dumps(grouped_output, indent=2)
+    for resource_name, property_name, finding in iter_deepsearch_findings(lint_results, template, order_by):
+        total += 1
+        severity_counts[finding["severity"] or "Unclassified"] += 1
 
-     
+        record = {"type": "finding", "resource": resource_name, "property": property_name}
+        record.update(finding)
+        yield dumps(record) + "\n"
 
+    metrics.findings_total.inc(total, endpoint="deepsearch")
+    yield dumps({"type": "summary", "total": total, "severity": severity_counts}) + "\n"
@@ -1,4 +1,8 @@
-import json as j
+import config
+import metrics
+from custom_rule_engine import loaded_custom_rules, reads_one_resource, rule_read_types, run_custom_rules
+from json_encoding import dumps
+from utilities import severity_evaluation, match_property_name
 from rule_engine import (
     s3_check_public_access,
     s3_check_encryption,
@@ -15,57 +19,172 @@ list_of_securityGroup_rules = ['FromPort', 'ToPort']
 list_of_iam_rules = ['Action']
 #list of RDS rules
 list_of_rds_rules = ['StorageEncrypted']
+
+#resource type -> checkers for that type, every checker takes the resource and returns a
+#list of findings, threat_check looks up the checkers of a resource with one dict hit
+check_registry = {}
+
+
+#decorator to register a checker for one or more exact resource types
+def register_check(*resource_types):
+    def decorator(checker):
+        for resource_type in resource_types:
+            check_registry.setdefault(resource_type, []).append(checker)
+        return checker
+    return decorator
+
+
+# checking for AWS:S3:Bucket threaths
+@register_check('AWS::S3::Bucket')
+def s3_bucket_checks(value):
+    return [s3_check_public_access(s3_public_access_rules, value), s3_check_encryption(value)]
+
+
+# checking for AWS::EC2::SecurityGroup threaths
+@register_check('AWS::EC2::SecurityGroup')
+def security_group_checks(value):
+    return [
+        ec2_check_securitygroups(list_of_securityGroup_rules, i, value)
+        for i, _ in enumerate(value['Properties'].get('SecurityGroupIngress', []))
+    ]
+
+
+# checking for AWS::IAM::Role threaths
+@register_check('AWS::IAM::Role')
+def iam_role_checks(value):
+    return [iam_check_role(list_of_iam_rules, value)]
+
+
+# checking for AWS::RDS::DBInstance threaths
+@register_check('AWS::RDS::DBInstance')
+def rds_instance_checks(value):
+    return [rds_check_dbinstance(list_of_rds_rules, value)]
+
+
 def append_result(result, type_name, all_findings):
     if len(result) > 0:
         if type_name not in all_findings:
             all_findings[type_name] = []
         all_findings[type_name].append(result)
 
-def threat_check(data):
-    all_findings = {}
-    #loop in the uploded json to check for threats
+#name a custom rule finding is reported under, the last property in its path like the
+#native checks use, or the rule id when the match is on the whole resource
+def custom_finding_name(rule, match):
+    property_names = [str(item) for item in match.path[3:] if type(item) != int]
+    return property_names[-1] if property_names else rule.id
+
+
+#findings of rules/custom_rules.py grouped by resource name, {resource: {name: severity}}
+#resource_names limits the scan to those resources, resource_index is an index of resources,
+#rules the custom rules that run (all of them by default)
+def custom_rule_findings(resources, resource_names=None, resource_index=None, rules=None):
+    findings = {}
+    if not config.QUICKSCAN_CUSTOM_RULES:
+        return findings
+
+    for rule, match in run_custom_rules({'Resources': resources}, rules=rules, resource_names=resource_names,
+                                        resource_index=resource_index):
+        if len(match.path) < 2 or match.path[0] != 'Resources':
+            continue
+
+        #same severity DeepSearch gives to the match
+        name = custom_finding_name(rule, match)
+        severity = severity_evaluation(match_property_name(match))
+        findings.setdefault(match.path[1], {})[name] = severity
+
+    return findings
+
+
+#type of a resource and the list of findings of the registered checks and of the custom rules
+def resource_findings(value, custom_findings):
+    type_name = value.get('Type', '')
+
+    results = []
+    reported = set()
+    for checker in check_registry.get(type_name, ()):
+        for result in checker(value):
+            if len(result) > 0:
+                results.append(result)
+                reported.update(result)
+
+    #custom rule findings the native checks did not already report for this resource
+    custom_result = {name: severity for name, severity in custom_findings.items() if name not in reported}
+    if len(custom_result) > 0:
+        results.append(custom_result)
+
+    return type_name, results
+
+
+def template_resources(data):
     try:
-        reseurces = data['Resources']
+        return data['Resources']
     except KeyError:
-        reseurces = data['Resource']
-    for key, value in reseurces.items():
-
-        #checking for S3 threaths
-        if 'S3' in value.get('Type', ''):
-            # checking for AWS:S3:Bucket threaths
-            if 'S3::Bucket' in value.get('Type', ''):
-                result1 = s3_check_public_access(s3_public_access_rules, value)
-                result2 = s3_check_encryption(value)
-
-                for result in [result1, result2]:
-                    type_name = 'AWS::S3::Bucket'
-                    append_result(result, type_name, all_findings)
-            
-        #checking for EC2 threats
-        if 'EC2' in value.get('Type', ''):
-            # checking for AWS::EC2::SecurityGroup threaths
-            if 'EC2::SecurityGroup' in value.get('Type', ''):
-                for i, _ in enumerate(value['Properties'].get('SecurityGroupIngress', [])):
-                    result = ec2_check_securitygroups(list_of_securityGroup_rules, i, value)
-                    type_name = 'AWS::EC2::SecurityGroup'
-                    append_result(result, type_name, all_findings)
-                
-        #checking for IAM threats
-        if 'IAM' in value.get('Type', ''):
-            # checking for AWS::IAM::Role threaths
-            if 'IAM::Role' in value.get('Type', ''):
-                result = iam_check_role(list_of_iam_rules, value)
-                type_name = 'AWS::IAM::Role'
-                append_result(result, type_name, all_findings)
-
-        #checking for RDS threats
-        if 'RDS' in value.get('Type', ''):
-            # checking for AWS::RDS::DBInstance threaths
-            if 'RDS::DBInstance' in value.get('Type', ''):
-                result = rds_check_dbinstance(list_of_rds_rules, value)
-                type_name = 'AWS::RDS::DBInstance'
-                append_result(result, type_name, all_findings)
-
-
-    return j.dumps(all_findings, indent=2)
+        return data['Resource']
+
+
+#group the per resource findings by resource type, in template order
+def group_findings(per_resource_findings):
+    all_findings = {}
+    for type_name, results in per_resource_findings:
+        for result in results:
+            append_result(result, type_name, all_findings)
+
+    return all_findings
+
+def count_findings(all_findings):
+    return sum(len(result) for results in all_findings.values() for result in results)
+
+def threat_check(data):
+    #loop in the uploded json to check for threats
+    resources = template_resources(data)
+
+    with metrics.stage("quickscan", "custom_rules"):
+        custom_findings = custom_rule_findings(resources)
+
+    with metrics.stage("quickscan", "checks"):
+        all_findings = group_findings(
+            resource_findings(value, custom_findings.get(key, {})) for key, value in resources.items()
+        )
+    metrics.findings_total.inc(count_findings(all_findings), endpoint="quickscan")
+
+    with metrics.stage("quickscan", "json_encode"):
+        return dumps(all_findings)
+
+
+#quick scan of resources that arrive one at a time, every resource is checked and dropped
+#right away so memory is bounded by the biggest resource. the custom rules reading one
+#resource run on every resource as it arrives, the resources the other rules read (the vpcs
+#and flow logs of W13) are kept and checked once the last one is in, the findings are
+#those of threat_check
+def threat_check_resources(resource_items):
+    one_resource_rules = [rule for rule in loaded_custom_rules if reads_one_resource(rule)]
+    kept_types = set()
+    for rule in loaded_custom_rules:
+        if not reads_one_resource(rule):
+            read_types = rule_read_types(rule)
+            kept_types = None if read_types is None or kept_types is None else kept_types | read_types
+
+    #(name, findings) in template order, the findings of a kept resource come at the end
+    checked = []
+    kept = {}
+
+    #the body is read and parsed while the checks run, both are in this stage
+    with metrics.stage("quickscan", "stream_checks"):
+        for name, value in resource_items:
+            if kept_types is None or value.get('Type') in kept_types:
+                kept[name] = value
+                checked.append((name, None))
+                continue
+
+            custom_findings = custom_rule_findings({name: value}, rules=one_resource_rules)
+            checked.append((name, resource_findings(value, custom_findings.get(name, {}))))
+
+        kept_findings = custom_rule_findings(kept)
+        all_findings = group_findings(
+            findings if findings is not None else resource_findings(kept[name], kept_findings.get(name, {}))
+            for name, findings in checked
+        )
+    metrics.findings_total.inc(count_findings(all_findings), endpoint="quickscan")
 
+    with metrics.stage("quickscan", "json_encode"):
+        return dumps(all_findings)
@@ -0,0 +1,121 @@
+import threading
+import time
+from functools import wraps
+
+from flask import make_response
+
+import config
+import lint_pool
+import metrics
+
+
+#admission control of the scan endpoints. every endpoint runs at most max_active scans at
+#once, up to max_waiting more requests wait for a slot and the rest are rejected right away
+#with 503 and a Retry-After, so a burst of scans queues instead of slowing every scan down
+
+class OverloadedError(Exception):
+    pass
+
+
+class AdmissionLimiter:
+
+    def __init__(self, endpoint, max_active, max_waiting, wait_seconds):
+        self.endpoint = endpoint
+        self.max_active = max(1, max_active)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_seconds = wait_seconds
+        self.active = 0
+        self.waiting = 0
+        self._slot_free = threading.Condition()
+
+    #a background scan (a job) waits for its slot as long as it takes and is not counted in
+    #the requests waiting, the job manager bounds its own queue
+    def acquire(self, background=False):
+        start = time.monotonic()
+        with self._slot_free:
+            if self.active >= self.max_active:
+                if background:
+                    self._slot_free.wait_for(self._has_free_slot)
+                else:
+                    self._wait_for_slot()
+
+            self.active += 1
+            metrics.admission_active.set(self.active, endpoint=self.endpoint)
+        metrics.admission_wait_seconds.observe(time.monotonic() - start, endpoint=self.endpoint)
+
+    def _has_free_slot(self):
+        return self.active < self.max_active
+
+    def _wait_for_slot(self):
+        if self.waiting >= self.max_waiting:
+            self._reject("queue_full")
+            raise OverloadedError("Too many scans are running, retry later")
+
+        self._set_waiting(self.waiting + 1)
+        try:
+            admitted = self._slot_free.wait_for(self._has_free_slot, self.wait_seconds)
+        finally:
+            self._set_waiting(self.waiting - 1)
+
+        if not admitted:
+            self._reject("timeout")
+            raise OverloadedError("Timed out waiting for a free scan slot, retry later")
+
+    def release(self):
+        with self._slot_free:
+            self.active -= 1
+            metrics.admission_active.set(self.active, endpoint=self.endpoint)
+            self._slot_free.notify()
+
+    def _set_waiting(self, waiting):
+        self.waiting = waiting
+        metrics.admission_queue_depth.set(waiting, endpoint=self.endpoint)
+
+    def _reject(self, reason):
+        metrics.admission_rejections_total.inc(endpoint=self.endpoint, reason=reason)
+
+
+def overloaded_response(error):
+    return {"error": str(error)}, 503, {"Retry-After": str(config.ADMISSION_RETRY_AFTER_SECONDS)}
+
+
+#the slot of a streamed response is held until the stream is closed
+def admitted(limiter):
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            try:
+                limiter.acquire()
+            except OverloadedError as e:
+                return overloaded_response(e)
+
+            try:
+                response = make_response(handler(*args, **kwargs))
+            except BaseException:
+                limiter.release()
+                raise
+
+            if response.is_streamed:
+                response.call_on_close(limiter.release)
+            else:
+                limiter.release()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+#-1 runs one deep search per lint worker
+def _deepsearch_max_active():
+    if config.DEEPSEARCH_MAX_ACTIVE < 0:
+        return max(1, lint_pool.pool_size())
+    return config.DEEPSEARCH_MAX_ACTIVE
+
+
+quickscan_limiter = AdmissionLimiter("quickscan", config.QUICKSCAN_MAX_ACTIVE, config.QUICKSCAN_MAX_WAITING,
+                                     config.ADMISSION_WAIT_SECONDS)
+deepsearch_limiter = AdmissionLimiter("deepsearch", _deepsearch_max_active(), config.DEEPSEARCH_MAX_WAITING,
+                                      config.ADMISSION_WAIT_SECONDS)
+batch_limiter = AdmissionLimiter("batch", config.BATCH_MAX_ACTIVE, config.BATCH_MAX_WAITING,
+                                 config.ADMISSION_WAIT_SECONDS)
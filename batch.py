@@ -0,0 +1,172 @@
+import io
+import json as js
+import zipfile
+
+import config
+import lint_pool
+import scan_service
+from QuickScan import threat_check
+from DeepSearch import generate_deepsearch_result, lint_cloudformation_template
+from template_parser import parse_template, TemplateParseError
+
+
+batch_modes = ("quickscan", "deepsearch")
+
+#extensions of the archive members that are treated as templates
+template_extensions = (".json", ".template", ".yaml", ".yml")
+
+
+class BatchError(Exception):
+    pass
+
+
+#scan one template inside a worker process for the given modes, returns {mode: (json, ok)}:
+#the same json strings the single template endpoints return, ok is false for an error report
+def scan_template(raw_template, parsed_template, modes):
+    results = {}
+
+    if "quickscan" in modes:
+        try:
+            results["quickscan"] = (threat_check(parsed_template), True)
+        except Exception as e:
+            results["quickscan"] = (js.dumps({"error": f"QuickScan failed: {e}"}), False)
+
+    if "deepsearch" in modes:
+        try:
+            scan_results = lint_cloudformation_template(raw_template)
+            deepsearch_json = generate_deepsearch_result(scan_results, raw_template)
+        except lint_pool.TemplateDecodeError as e:
+            deepsearch_json = {"error": str(e)}
+        if isinstance(deepsearch_json, str):
+            results["deepsearch"] = (deepsearch_json, True)
+        else:
+            results["deepsearch"] = (js.dumps(deepsearch_json), False)
+
+    return results
+
+
+#templates posted as a json array of {"name": ..., "template": ...} or as a {name: template} object
+def templates_from_json(body):
+    #keys of the last object decoded, the top level one, that are repeated
+    duplicate_names = []
+
+    def unique_keys(pairs):
+        mapping = dict(pairs)
+        duplicate_names.clear()
+        if len(mapping) != len(pairs):
+            seen = set()
+            for key, _ in pairs:
+                if key in seen:
+                    duplicate_names.append(key)
+                seen.add(key)
+        return mapping
+
+    try:
+        payload = js.loads(body, object_pairs_hook=unique_keys)
+    except ValueError:
+        raise BatchError("The batch body is not valid json")
+
+    if isinstance(payload, dict):
+        if duplicate_names:
+            raise BatchError(f"The batch has several templates named {duplicate_names[0]}")
+        items = list(payload.items())
+    elif isinstance(payload, list):
+        items = []
+        for i, entry in enumerate(payload):
+            if not isinstance(entry, dict) or "template" not in entry:
+                raise BatchError(f"Batch entry {i} has no template")
+            items.append((str(entry.get("name", i)), entry["template"]))
+    else:
+        raise BatchError("The batch body must be a json array or object")
+
+    templates = {}
+    for name, template in items:
+        if name in templates:
+            raise BatchError(f"The batch has several templates named {name}")
+        #parsed templates are serialized again, their line numbers refer to this text
+        if not isinstance(template, str):
+            template = js.dumps(template, indent=2)
+        templates[name] = template
+
+    return templates
+
+
+#templates posted as a zip archive, every member with a template extension is scanned
+def templates_from_archive(body):
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(body))
+    except zipfile.BadZipFile:
+        raise BatchError("The batch body is not a valid zip archive")
+
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(template_extensions)
+    ]
+
+    if sum(info.file_size for info in members) > config.BATCH_MAX_ARCHIVE_BYTES:
+        raise BatchError("The archive is too large once extracted")
+
+    templates = {}
+    for info in members:
+        if info.filename in templates:
+            raise BatchError(f"The archive has several members named {info.filename}")
+        templates[info.filename] = archive.read(info).decode("utf-8", errors="replace")
+
+    return templates
+
+
+#scan every template across the worker processes and return {name: {mode: result}} as json.
+#the results are keyed like the single template endpoints: a template already scanned by
+#them or by an earlier batch comes from the cache or the store, new reports are kept there
+def run_batch(templates, modes=batch_modes):
+    if len(templates) > config.BATCH_MAX_TEMPLATES:
+        raise BatchError(f"A batch can contain at most {config.BATCH_MAX_TEMPLATES} templates")
+
+    results = {name: {} for name in templates}
+    keys = {}
+    futures = {}
+    for name, raw_template in templates.items():
+        parsed_template = None
+        for mode in modes:
+            try:
+                if mode == "quickscan":
+                    parsed_template = parse_template(raw_template)
+                    keys[name, mode] = scan_service.quickscan_key(parsed_template)
+                else:
+                    keys[name, mode] = scan_service.deepsearch_key(raw_template)
+            except TemplateParseError as e:
+                results[name][mode] = js.dumps({"error": f"QuickScan failed: {e}"})
+                continue
+
+            cached_json = scan_service.cached_result(keys[name, mode])
+            if cached_json is not None:
+                results[name][mode] = cached_json
+
+        missing_modes = [mode for mode in modes if mode not in results[name]]
+        if missing_modes:
+            futures[name] = lint_pool.submit(scan_template, raw_template, parsed_template, missing_modes)
+
+    new_reports = []
+    for name, future in futures.items():
+        try:
+            scanned = future.result()
+        except Exception as e:
+            results[name]["error"] = js.dumps(f"Scan failed: {e}")
+            continue
+
+        for mode, (result_json, ok) in scanned.items():
+            results[name][mode] = result_json
+            if ok:
+                new_reports.append((keys[name, mode], result_json))
+
+    if new_reports:
+        scan_service.keep_results(new_reports)
+
+    #the per template results are already json, they are joined without being parsed again
+    output_parts = []
+    for name, name_results in results.items():
+        ordered = [mode for mode in (*modes, "error") if mode in name_results]
+        result_parts = [f"{js.dumps(mode)}: {name_results[mode]}" for mode in ordered]
+        output_parts.append(f"{js.dumps(name)}: {{{', '.join(result_parts)}}}")
+
+    return "{" + ", ".join(output_parts) + "}"
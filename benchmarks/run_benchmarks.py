@@ -0,0 +1,178 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+#the scanner modules live in the repository root
+repo_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_root))
+os.chdir(repo_root)
+
+import cfnlint.version
+
+import config
+from QuickScan import threat_check
+from DeepSearch import generate_deepsearch_result, lint_cloudformation_template
+from template_parser import build_line_index, parse_template
+from utilities import find_line, create_path_for_coordinate_resources
+
+from synthetic_templates import generate_template_text
+
+
+default_templates = (
+    ["template_safe.json", "template_discrete.json"]
+    + sorted(glob.glob("public/cloud_formation_test_templates/*.json"))
+)
+default_synthetic_sizes = [10, 100, 1000, 10000, 50000]
+
+stages = ["threat_check", "lint_cloudformation_template", "generate_deepsearch_result", "find_line"]
+
+
+#memory blocks traced in a snapshot, without the ones of tracemalloc itself
+def traced_blocks(snapshot):
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return sum(stat.count for stat in snapshot.statistics("filename"))
+
+
+#run fn repeat times for the wall time, then once under tracemalloc for the allocations:
+#the peak traced memory during the stage, and the memory and number of blocks still held
+#once it returned (caches). tracemalloc only sees the blocks alive at a snapshot, so the
+#blocks allocated and freed during the stage are not counted, the peak bytes cover them
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        blocks_before = traced_blocks(tracemalloc.take_snapshot())
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+        retained_blocks = traced_blocks(tracemalloc.take_snapshot()) - blocks_before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_seconds": {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+        },
+        "retained_bytes": current,
+        "retained_blocks": retained_blocks,
+        "peak_allocated_bytes": peak,
+    }
+
+
+def bench_template(name, text, args):
+    try:
+        data = parse_template(text)
+    except Exception as e:
+        return [{"template": name, "error": f"Unparsable template: {e}"}]
+
+    if not isinstance(data, dict) or not isinstance(data.get("Resources"), dict):
+        return [{"template": name, "error": "The template has no Resources object"}]
+
+    resources = len(data["Resources"])
+    size = len(text.encode())
+    run_lint = resources <= args.max_lint_resources
+
+    #the lint output is shared by the stages that consume it
+    lint_results = lint_cloudformation_template(text) if run_lint else None
+    match_paths = [create_path_for_coordinate_resources(match.path) for match in lint_results or []]
+
+    def find_lines():
+        line_index = build_line_index(text)
+        for path in match_paths:
+            find_line(line_index, path)
+
+    stage_functions = {
+        "threat_check": lambda: threat_check(data),
+        "lint_cloudformation_template": lambda: lint_cloudformation_template(text),
+        "generate_deepsearch_result": lambda: generate_deepsearch_result(list(lint_results), text),
+        "find_line": find_lines,
+    }
+
+    results = []
+    for stage in args.stages:
+        record = {"template": name, "stage": stage, "resources": resources, "bytes": size}
+
+        if stage != "threat_check" and not run_lint:
+            record["skipped"] = f"more than {args.max_lint_resources} resources"
+        elif stage != "threat_check" and stage != "lint_cloudformation_template" and lint_results is None:
+            record["skipped"] = "linting failed"
+        else:
+            try:
+                record.update(measure(stage_functions[stage], args.repeat))
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                results.append(record)
+                continue
+
+            seconds = record["wall_seconds"]["median"] or 1e-9
+            record["throughput"] = {
+                "resources_per_second": resources / seconds,
+                "bytes_per_second": size / seconds,
+            }
+            if stage != "threat_check":
+                record["findings"] = len(match_paths)
+
+        results.append(record)
+        print(f"{name} {stage}: {record.get('wall_seconds', {}).get('median', record.get('skipped'))}", file=sys.stderr)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scanner stages over the bundled and synthetic templates")
+    parser.add_argument("--templates", nargs="*", default=default_templates, help="template files to benchmark")
+    parser.add_argument("--synthetic", nargs="*", type=int, default=default_synthetic_sizes, help="resource counts of the synthetic templates")
+    parser.add_argument("--stages", nargs="*", choices=stages, default=stages)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--max-lint-resources", type=int, default=2000, help="skip the cfn-lint stages on bigger templates")
+    parser.add_argument("--lint-pool", action="store_true", help="lint on the worker pool instead of in this process")
+    parser.add_argument("--output", help="write the json report to this file instead of stdout")
+    args = parser.parse_args()
+
+    #by default lint in process, so its allocations are part of the measure
+    if not args.lint_pool:
+        config.LINT_POOL_SIZE = 0
+
+    results = []
+    for template_path in args.templates:
+        with open(template_path, "r") as f:
+            results.extend(bench_template(template_path, f.read(), args))
+
+    for resource_count in args.synthetic:
+        results.extend(bench_template(f"synthetic-{resource_count}", generate_template_text(resource_count), args))
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "cfn_lint": cfnlint.version.__version__,
+            "lint_pool": args.lint_pool,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+
+
+#resource builders cycled by generate_template, a mix of safe and unsafe settings so every
+#QuickScan check and most custom rules produce findings
+def _bucket(i):
+    return {
+        "Type": "AWS::S3::Bucket",
+        "Properties": {
+            "BucketName": f"synthetic-bucket-{i}",
+            "PublicAccessBlockConfiguration": {
+                "BlockPublicAcls": i % 2 == 0,
+                "IgnorePublicAcls": True,
+                "BlockPublicPolicy": i % 3 == 0,
+                "RestrictPublicBuckets": True,
+            },
+            "BucketEncryption": {
+                "ServerSideEncryptionConfiguration": [
+                    {"ServerSideEncryptionByDefault": {"SSEAlgorithm": "AES256" if i % 4 else "aws:kms"}}
+                ]
+            },
+        },
+    }
+
+
+def _security_group(i):
+    return {
+        "Type": "AWS::EC2::SecurityGroup",
+        "Properties": {
+            "GroupDescription": f"Synthetic group {i}",
+            "VpcId": {"Ref": "SyntheticVpc"},
+            "SecurityGroupIngress": [
+                {"IpProtocol": "tcp", "FromPort": "22", "ToPort": "22", "CidrIp": "0.0.0.0/0" if i % 2 else "10.0.0.0/8"},
+                {"IpProtocol": "tcp", "FromPort": "443", "ToPort": "443", "CidrIp": "0.0.0.0/0"},
+            ],
+        },
+    }
+
+
+def _role(i):
+    return {
+        "Type": "AWS::IAM::Role",
+        "Properties": {
+            "AssumeRolePolicyDocument": {
+                "Version": "2012-10-17",
+                "Statement": [{"Effect": "Allow", "Principal": {"Service": "ec2.amazonaws.com"}, "Action": "sts:AssumeRole"}],
+            },
+            "Policies": [{
+                "PolicyName": f"synthetic-policy-{i}",
+                "PolicyDocument": {
+                    "Version": "2012-10-17",
+                    "Statement": [{"Effect": "Allow", "Action": "*" if i % 3 == 0 else "s3:GetObject", "Resource": "*"}],
+                },
+            }],
+        },
+    }
+
+
+def _db_instance(i):
+    return {
+        "Type": "AWS::RDS::DBInstance",
+        "Properties": {
+            "DBInstanceClass": "db.t3.micro",
+            "Engine": "mysql",
+            "AllocatedStorage": "20",
+            "MasterUsername": "admin",
+            "MasterUserPassword": "{{resolve:secretsmanager:synthetic}}",
+            "StorageEncrypted": i % 2 == 0,
+        },
+    }
+
+
+def _log_group(i):
+    return {
+        "Type": "AWS::Logs::LogGroup",
+        "Properties": {"LogGroupName": f"/synthetic/{i}"},
+    }
+
+
+resource_builders = [_bucket, _security_group, _role, _db_instance, _log_group]
+
+
+#template with resource_count resources plus the VPC the security groups reference
+def generate_template(resource_count):
+    resources = {
+        "SyntheticVpc": {"Type": "AWS::EC2::VPC", "Properties": {"CidrBlock": "10.0.0.0/16"}},
+    }
+    for i in range(resource_count):
+        builder = resource_builders[i % len(resource_builders)]
+        resources[f"Synthetic{builder.__name__.title().replace('_', '')}{i}"] = builder(i)
+
+    return {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Description": f"Synthetic template with {resource_count} resources",
+        "Resources": resources,
+    }
+
+
+#the text is indented like the bundled templates so line mapping has real work to do
+def generate_template_text(resource_count):
+    return json.dumps(generate_template(resource_count), indent=2)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import cfnlint.version
+
+import config
+import metrics
+import utilities
+
+
+#files whose content decides the findings and their reports, a change in any of them
+#invalidates the cache and the result store
+RULE_SOURCES = [
+    "QuickScan.py", "rule_engine.py", "utilities.py", "custom_rule_engine.py", "rules/custom_rules.py",
+    "DeepSearch.py", "lint_pool.py", "cli.py",
+]
+
+
+@lru_cache(maxsize=1)
+def _rule_sources_digest():
+    digest = hashlib.sha256()
+    digest.update(cfnlint.version.__version__.encode())
+
+    base_dir = Path(__file__).parent
+    for source in RULE_SOURCES:
+        try:
+            digest.update((base_dir / source).read_bytes())
+        except OSError:
+            digest.update(source.encode())
+
+    return digest.hexdigest()
+
+
+#fingerprint of the active rule set, the severity table and the cfn-lint version that runs them
+def rules_fingerprint():
+    return _rule_sources_digest() + utilities.severity_table_fingerprint
+
+
+#quickscan only looks at the parsed template, so key order and whitespace do not matter
+def normalize_parsed_template(data):
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+#deepsearch reports line numbers, so the text is kept as is apart from the line endings
+def normalize_raw_template(raw_data):
+    return raw_data.replace("\r\n", "\n")
+
+
+def result_key(mode, normalized_template, *extra):
+    digest = hashlib.sha256()
+    for part in (mode, rules_fingerprint(), *extra, normalized_template):
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+#in memory LRU cache of the scan results with a ttl and a memory cap
+class ResultCache:
+
+    def __init__(self, max_entries, ttl_seconds, max_bytes):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        #key -> (expires_at, size, value), the most recently used entry is the last one
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                metrics.cache_events_total.inc(event="miss")
+                return None
+
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                metrics.cache_events_total.inc(event="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.cache_events_total.inc(event="hit")
+            return entry[2]
+
+    def put(self, key, value):
+        #memory of the string, non ascii text takes 2 or 4 bytes per character
+        size = sys.getsizeof(value)
+
+        #results bigger than the whole cache are never stored
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+                metrics.cache_events_total.inc(event="eviction")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+result_cache = ResultCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS, config.CACHE_MAX_BYTES)
+
+
+def _collect_cache_metrics():
+    stats = result_cache.stats()
+    metrics.cache_entries.set(stats["entries"])
+    metrics.cache_bytes.set(stats["bytes"])
+
+
+metrics.registry.add_collector(_collect_cache_metrics)
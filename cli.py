@@ -0,0 +1,310 @@
+import argparse
+import codecs
+import fnmatch
+import hashlib
+import json as js
+import mmap
+import os
+import sys
+
+import config
+import lint_pool
+from batch import batch_modes, template_extensions
+from cache import result_key
+from DeepSearch import iter_deepsearch_findings
+from QuickScan import custom_rule_findings, resource_findings, template_resources
+from result_store import ResultStore
+from template_parser import parse_template, NotATemplateError
+
+
+#command line scanner for CI, scans every template under the given paths on the lint pool
+#   python3 cli.py infra/ --modes quickscan,deepsearch --fail-on Medium
+#exit codes: 0 no finding at or above --fail-on, 1 findings at or above it, 2 a template failed
+
+exit_ok = 0
+exit_findings = 1
+exit_errors = 2
+
+severity_ranks = {"High": 3, "Medium": 2, "Low": 1, None: 0}
+fail_on_levels = ("High", "Medium", "Low", "never")
+
+skipped_directories = {".git", "node_modules", "__pycache__", ".venv", "venv", "dist"}
+
+
+def find_templates(paths, exclude_patterns=()):
+    def excluded(path):
+        return any(fnmatch.fnmatch(path, pattern) for pattern in exclude_patterns)
+
+    templates = []
+    for path in paths:
+        if os.path.isfile(path):
+            if not excluded(path):
+                templates.append(path)
+            continue
+
+        for root, directories, files in os.walk(path):
+            directories[:] = sorted(
+                directory for directory in directories
+                if directory not in skipped_directories and not directory.startswith(".")
+            )
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                if name.lower().endswith(template_extensions) and not excluded(file_path):
+                    templates.append(file_path)
+
+    return templates
+
+
+#the template text, or None when the file can not be a template. files above
+#config.CLI_MMAP_BYTES are memory mapped: the check runs on the mapping, so big non template
+#files (lock files, data dumps) are never read, and a template is decoded straight from it
+def read_template(path):
+    size = os.path.getsize(path)
+    if size == 0:
+        return None
+
+    with open(path, "rb") as template_file:
+        if size < config.CLI_MMAP_BYTES:
+            content = template_file.read()
+            if content.find(b"Resources") == -1:
+                return None
+            return content.decode("utf-8", errors="replace")
+
+        with mmap.mmap(template_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped.find(b"Resources") == -1:
+                return None
+            return codecs.decode(mapped, "utf-8", errors="replace")
+
+
+#hash of the file content, big files are hashed from a memory mapping
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as template_file:
+        if os.path.getsize(path) < config.CLI_MMAP_BYTES:
+            digest.update(template_file.read())
+        else:
+            with mmap.mmap(template_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+
+    return digest.hexdigest()
+
+
+def quickscan_findings(data):
+    resources = template_resources(data)
+    custom_findings = custom_rule_findings(resources)
+
+    findings = []
+    for resource_name, value in resources.items():
+        _, results = resource_findings(value, custom_findings.get(resource_name, {}))
+        for result in results:
+            for property_name, severity in result.items():
+                findings.append({"resource": resource_name, "property": property_name, "severity": severity})
+
+    return findings
+
+
+#lint errors are raised with their message instead of being printed
+def deepsearch_findings(raw_template, selection, regions):
+    lint_results = lint_pool.lint_regions(raw_template, regions, selection)
+
+    findings = []
+    for resource_name, property_name, finding in iter_deepsearch_findings(lint_results, raw_template):
+        findings.append(dict(finding, resource=resource_name, property=property_name))
+
+    return findings
+
+
+#scan one file inside a worker process
+def scan_file(path, modes, selection=None, regions=lint_pool.default_regions):
+    try:
+        raw_template = read_template(path)
+        if raw_template is None:
+            return {"skipped": True}
+
+        try:
+            data = parse_template(raw_template)
+        except NotATemplateError:
+            return {"skipped": True}
+
+        results = {}
+        if "quickscan" in modes:
+            results["quickscan"] = quickscan_findings(data)
+        if "deepsearch" in modes:
+            results["deepsearch"] = deepsearch_findings(raw_template, selection, regions)
+        return results
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+#only the templates whose content, options or rules changed since the results in the store
+#are scanned again, returns ({path: result}, number of results taken from the store)
+def scan_paths(paths, modes, selection=None, regions=lint_pool.default_regions, exclude_patterns=(), store=None):
+    templates = find_templates(paths, exclude_patterns)
+
+    keys = {}
+    for path in templates:
+        try:
+            keys[path] = result_key("cli", file_digest(path), ",".join(modes), repr(selection), ",".join(regions))
+        except OSError:
+            pass
+    stored = store.get_many(set(keys.values())) if store is not None else {}
+
+    results = {}
+    futures = []
+    for path in templates:
+        if keys.get(path) in stored:
+            results[path] = js.loads(stored[keys[path]])
+        else:
+            futures.append((path, lint_pool.submit(scan_file, path, modes, selection, regions)))
+    stored_count = len(results)
+
+    for path, future in futures:
+        try:
+            results[path] = future.result()
+        except Exception as e:
+            results[path] = {"error": str(e)}
+
+    #failed scans are retried on the next run
+    if store is not None:
+        store.put_many((keys[path], js.dumps(results[path])) for path, _ in futures
+                       if path in keys and "error" not in results[path])
+
+    return {path: results[path] for path in templates}, stored_count
+
+
+def summarize(results, modes):
+    summary = {"templates": 0, "skipped": 0, "errors": 0, "severity": {"High": 0, "Medium": 0, "Low": 0, "Unclassified": 0}}
+
+    for result in results.values():
+        if result.get("skipped"):
+            summary["skipped"] += 1
+            continue
+        if "error" in result:
+            summary["errors"] += 1
+            continue
+
+        summary["templates"] += 1
+        for mode in modes:
+            for finding in result.get(mode, []):
+                summary["severity"][finding["severity"] or "Unclassified"] += 1
+
+    return summary
+
+
+def exit_code(results, summary, fail_on):
+    if summary["errors"]:
+        return exit_errors
+    if fail_on == "never":
+        return exit_ok
+
+    threshold = severity_ranks[fail_on]
+    for result in results.values():
+        for mode in batch_modes:
+            for finding in result.get(mode, []):
+                if severity_ranks.get(finding["severity"], 0) >= threshold:
+                    return exit_findings
+
+    return exit_ok
+
+
+def print_text_report(results, summary, modes, output):
+    for path, result in results.items():
+        if result.get("skipped"):
+            continue
+        if "error" in result:
+            print(f"{path}: error: {result['error']}", file=output)
+            continue
+
+        for mode in modes:
+            findings = sorted(result.get(mode, []), key=lambda finding: -severity_ranks.get(finding["severity"], 0))
+            for finding in findings:
+                location = path
+                if finding.get("path", "not found") != "not found":
+                    location = f"{path}:{finding['path']}"
+
+                description = f"{finding['resource']} {finding['property']}"
+                if finding.get("message"):
+                    description = f"{description}: {finding['message']}"
+
+                print(f"{location}: {finding['severity'] or 'Unclassified'} [{mode}] {description}", file=output)
+
+    severity = ", ".join(f"{count} {level}" for level, count in summary["severity"].items())
+    print(f"{summary['templates']} templates scanned ({summary['from_store']} unchanged), {summary['skipped']} skipped, "
+          f"{summary['errors']} errors: {severity}", file=output)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Scan the CloudFormation templates under the given paths")
+    parser.add_argument("paths", nargs="*", default=["."], help="template files or directories (default: .)")
+    parser.add_argument("--modes", default="quickscan,deepsearch", help="comma separated scans to run")
+    parser.add_argument("--fail-on", default="High", choices=fail_on_levels,
+                        help="lowest severity that makes the scan fail (default: High)")
+    parser.add_argument("--format", default="text", choices=("text", "json"))
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    parser.add_argument("--workers", type=int, help="worker processes, 0 scans in this process (default: one per cpu)")
+    parser.add_argument("--exclude", action="append", default=[], help="glob of paths to skip, can be repeated")
+    parser.add_argument("--store", default=config.CLI_RESULT_STORE_PATH,
+                        help=f"sqlite result store of the earlier runs (default: {config.CLI_RESULT_STORE_PATH})")
+    parser.add_argument("--no-store", action="store_true", help="scan every template again and keep no results")
+    parser.add_argument("--regions", default=",".join(lint_pool.default_regions), help="comma separated deep search regions")
+    parser.add_argument("--rules", default="", help="deep search rule ids to run")
+    parser.add_argument("--exclude-rules", default="", help="deep search rule ids to skip")
+    parser.add_argument("--tags", default="", help="deep search rule tags to run")
+    parser.add_argument("--exclude-tags", default="", help="deep search rule tags to skip")
+    return parser.parse_args(argv)
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    modes = split_list(args.modes)
+    regions = tuple(dict.fromkeys(split_list(args.regions)))
+    unknown_modes = [mode for mode in modes if mode not in batch_modes]
+    unknown_regions = [region for region in regions if region not in lint_pool.supported_regions]
+    if unknown_modes or not modes:
+        print(f"--modes must be a list of {', '.join(batch_modes)}", file=sys.stderr)
+        return exit_errors
+    if unknown_regions or not regions:
+        print(f"Unknown regions: {', '.join(unknown_regions)}", file=sys.stderr)
+        return exit_errors
+
+    selection = lint_pool.rule_selection(split_list(args.rules), split_list(args.exclude_rules),
+                                         split_list(args.tags), split_list(args.exclude_tags))
+
+    if args.workers is not None:
+        config.LINT_POOL_SIZE = args.workers
+
+    store = None
+    if args.store and not args.no_store:
+        store = ResultStore(args.store, config.RESULT_STORE_MAX_ENTRIES, config.RESULT_STORE_MAX_AGE_DAYS)
+
+    lint_pool.start()
+    try:
+        results, stored_count = scan_paths(args.paths, modes, selection, regions, args.exclude, store)
+    finally:
+        lint_pool.shutdown()
+
+    summary = summarize(results, modes)
+    summary["from_store"] = stored_count
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            js.dump({"templates": results, "summary": summary}, output, indent=2)
+            output.write("\n")
+        else:
+            print_text_report(results, summary, modes, output)
+    finally:
+        if args.output:
+            output.close()
+
+    return exit_code(results, summary, args.fail_on)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+
+
+#settings of the scanner, every value can be overridden with an environment variable
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"Invalid value for {name}, using {default}")
+        return default
+
+
+#result cache shared by /api/quickscan and /api/deepsearch
+CACHE_MAX_ENTRIES = _env_int("TIRITH_CACHE_MAX_ENTRIES", 256)
+CACHE_TTL_SECONDS = _env_int("TIRITH_CACHE_TTL_SECONDS", 3600)
+CACHE_MAX_BYTES = _env_int("TIRITH_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+#optional json file with the severity keywords, {"High": [...], "Medium": [...], "Low": [...]}
+SEVERITY_KEYWORDS_FILE = os.environ.get("TIRITH_SEVERITY_KEYWORDS_FILE", "")
+
+#sqlite store of the scan results kept by the service between restarts, off ("") by default.
+#a relative path is resolved against the working directory when the store is created
+RESULT_STORE_PATH = os.environ.get("TIRITH_RESULT_STORE", "")
+#cli.py keeps a store by default, in the directory it runs from (--store, --no-store)
+CLI_RESULT_STORE_PATH = RESULT_STORE_PATH or ".tirith/results.sqlite"
+RESULT_STORE_MAX_ENTRIES = _env_int("TIRITH_RESULT_STORE_MAX_ENTRIES", 100000)
+#results unused for this long are pruned
+RESULT_STORE_MAX_AGE_DAYS = _env_int("TIRITH_RESULT_STORE_MAX_AGE_DAYS", 30)
+
+#batch endpoint, the templates are scanned on the lint pool
+BATCH_MAX_TEMPLATES = _env_int("TIRITH_BATCH_MAX_TEMPLATES", 500)
+BATCH_MAX_ARCHIVE_BYTES = _env_int("TIRITH_BATCH_MAX_ARCHIVE_BYTES", 200 * 1024 * 1024)
+
+#pre-warmed cfn-lint worker processes, -1 means one per cpu and 0 lints in the request thread
+LINT_POOL_SIZE = _env_int("TIRITH_LINT_POOL_SIZE", -1)
+#a worker is replaced after this many jobs, 0 keeps the workers forever
+LINT_POOL_MAX_JOBS = _env_int("TIRITH_LINT_POOL_MAX_JOBS", 200)
+
+#async scan jobs
+JOBS_WORKERS = _env_int("TIRITH_JOBS_WORKERS", 4)
+JOBS_MAX_QUEUED = _env_int("TIRITH_JOBS_MAX_QUEUED", 100)
+JOBS_RESULT_TTL_SECONDS = _env_int("TIRITH_JOBS_RESULT_TTL_SECONDS", 900)
+JOBS_EVENTS_KEEPALIVE_SECONDS = _env_int("TIRITH_JOBS_EVENTS_KEEPALIVE_SECONDS", 15)
+JOBS_RETRY_AFTER_SECONDS = _env_int("TIRITH_JOBS_RETRY_AFTER_SECONDS", 5)
+
+#run the rules of rules/custom_rules.py natively as part of the quick scan, 0 disables them
+QUICKSCAN_CUSTOM_RULES = _env_int("TIRITH_QUICKSCAN_CUSTOM_RULES", 1)
+
+#incremental scan sessions kept in memory
+SESSIONS_MAX = _env_int("TIRITH_SESSIONS_MAX", 100)
+SESSIONS_TTL_SECONDS = _env_int("TIRITH_SESSIONS_TTL_SECONDS", 1800)
+
+#per request profiles, written as pstats and collapsed stacks to PROFILE_DIR
+PROFILE_DIR = os.environ.get("TIRITH_PROFILE_DIR", "profiles")
+#1 profiles the requests whose X-Tirith-Profile header carries PROFILE_TOKEN, the header is
+#ignored while the token is not set
+PROFILE_HEADER = _env_int("TIRITH_PROFILE_HEADER", 0)
+PROFILE_TOKEN = os.environ.get("TIRITH_PROFILE_TOKEN", "")
+#profile one scan request in N at random, 0 disables sampling
+PROFILE_SAMPLE_EVERY = _env_int("TIRITH_PROFILE_SAMPLE_EVERY", 0)
+#only the newest profiles are kept
+PROFILE_KEEP = _env_int("TIRITH_PROFILE_KEEP", 50)
+PROFILE_STACK_INTERVAL_MS = _env_int("TIRITH_PROFILE_STACK_INTERVAL_MS", 5)
+
+#regions a single deep search can lint, every region takes a lint worker
+DEEPSEARCH_MAX_REGIONS = _env_int("TIRITH_DEEPSEARCH_MAX_REGIONS", 8)
+
+#admission control, every scan endpoint runs at most *_MAX_ACTIVE scans at once and up to
+#*_MAX_WAITING requests wait for a slot, the others get a 503 with Retry-After
+QUICKSCAN_MAX_ACTIVE = _env_int("TIRITH_QUICKSCAN_MAX_ACTIVE", 8)
+QUICKSCAN_MAX_WAITING = _env_int("TIRITH_QUICKSCAN_MAX_WAITING", 32)
+#-1 runs one deep search per lint worker
+DEEPSEARCH_MAX_ACTIVE = _env_int("TIRITH_DEEPSEARCH_MAX_ACTIVE", -1)
+DEEPSEARCH_MAX_WAITING = _env_int("TIRITH_DEEPSEARCH_MAX_WAITING", 16)
+BATCH_MAX_ACTIVE = _env_int("TIRITH_BATCH_MAX_ACTIVE", 1)
+BATCH_MAX_WAITING = _env_int("TIRITH_BATCH_MAX_WAITING", 2)
+ADMISSION_WAIT_SECONDS = _env_int("TIRITH_ADMISSION_WAIT_SECONDS", 30)
+ADMISSION_RETRY_AFTER_SECONDS = _env_int("TIRITH_ADMISSION_RETRY_AFTER_SECONDS", 2)
+
+#request body caps, bigger bodies are rejected with 413
+MAX_BODY_BYTES = _env_int("TIRITH_MAX_BODY_BYTES", 256 * 1024 * 1024)
+QUICKSCAN_MAX_BODY_BYTES = _env_int("TIRITH_QUICKSCAN_MAX_BODY_BYTES", 128 * 1024 * 1024)
+DEEPSEARCH_MAX_BODY_BYTES = _env_int("TIRITH_DEEPSEARCH_MAX_BODY_BYTES", 16 * 1024 * 1024)
+#a streamed quick scan (?stream=1) holds one resource at a time, not the whole body
+QUICKSCAN_STREAM_MAX_BODY_BYTES = _env_int("TIRITH_QUICKSCAN_STREAM_MAX_BODY_BYTES", 2 * 1024 * 1024 * 1024)
+
+#production server started by wsgi.py
+SERVER_HOST = os.environ.get("TIRITH_SERVER_HOST", "0.0.0.0")
+SERVER_PORT = _env_int("TIRITH_SERVER_PORT", 8080)
+SERVER_THREADS = _env_int("TIRITH_SERVER_THREADS", 32)
+
+#cli.py memory maps the templates bigger than this instead of reading them
+CLI_MMAP_BYTES = _env_int("TIRITH_CLI_MMAP_BYTES", 1024 * 1024)
+
+#api responses: json bodies from this size on are compressed (gzip, or brotli when the
+#brotli package is installed and the client accepts it)
+RESPONSE_COMPRESS_MIN_BYTES = _env_int("TIRITH_RESPONSE_COMPRESS_MIN_BYTES", 1024)
+RESPONSE_GZIP_LEVEL = _env_int("TIRITH_RESPONSE_GZIP_LEVEL", 6)
+RESPONSE_BROTLI_QUALITY = _env_int("TIRITH_RESPONSE_BROTLI_QUALITY", 5)
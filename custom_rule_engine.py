@@ -0,0 +1,173 @@
+import inspect
+
+from cfnlint.rules import CloudFormationLintRule
+
+import rules.custom_rules as custom_rules
+
+
+#resources of one template grouped by type, built once and shared by every custom rule
+class ResourceIndex:
+
+    def __init__(self, resources):
+        #type -> {name: resource}, each group keeps the template order
+        self.by_type = {}
+        #name -> position in the template, to merge groups of several types in order
+        self.positions = {}
+        #name -> type
+        self.types = {}
+
+        for position, (name, resource) in enumerate(resources.items()):
+            self._add(name, resource, position)
+        self._next_position = len(resources)
+
+    def _add(self, name, resource, position):
+        if isinstance(resource, dict) and resource.get("Type") is not None:
+            group = self.by_type.setdefault(resource["Type"], {})
+            last_position = self.positions[next(reversed(group))] if group else -1
+            group[name] = resource
+            self.positions[name] = position
+            self.types[name] = resource["Type"]
+
+            #a changed resource goes back to its place in the group
+            if position < last_position:
+                self.by_type[resource["Type"]] = dict(sorted(group.items(), key=lambda item: self.positions[item[0]]))
+
+    #index a changed resource, None removes it. a new resource goes after the others like
+    #a key added by a JSON patch, a changed one keeps its position
+    def set(self, name, resource):
+        position = self.positions.get(name)
+        self.remove(name)
+        if position is None:
+            position = self._next_position
+            self._next_position += 1
+        self._add(name, resource, position)
+
+    def remove(self, name):
+        resource_type = self.types.pop(name, None)
+        if resource_type is None:
+            return
+
+        group = self.by_type[resource_type]
+        del group[name]
+        if not group:
+            del self.by_type[resource_type]
+        del self.positions[name]
+
+    #index of only these resources, in template order
+    def subset(self, names):
+        subset = ResourceIndex({})
+        for name in sorted((name for name in names if name in self.types), key=self.positions.get):
+            resource_type = self.types[name]
+            subset._add(name, self.by_type[resource_type][name], self.positions[name])
+        return subset
+
+    def has_any(self, resource_types):
+        return any(resource_type in self.by_type for resource_type in resource_types)
+
+    def get(self, resource_types):
+        groups = [self.by_type[resource_type] for resource_type in dict.fromkeys(resource_types) if resource_type in self.by_type]
+
+        if len(groups) == 1:
+            return dict(groups[0])
+
+        results = {}
+        for group in groups:
+            results.update(group)
+        return dict(sorted(results.items(), key=lambda item: self.positions[item[0]]))
+
+    def all(self):
+        return self.get(self.by_type)
+
+
+#minimal stand-in for the cfn-lint Template passed to CloudFormationLintRule.match,
+#the custom rules only need the resources of the parsed template
+class TemplateShim:
+
+    def __init__(self, template, resource_index=None):
+        self.template = template
+
+        resources = template.get("Resources", {})
+        self.resources = resources if isinstance(resources, dict) else {}
+        self.resource_index = resource_index or ResourceIndex(self.resources)
+
+    #same contract as cfnlint.template.Template.get_resources, answered from the index
+    def get_resources(self, resource_type=[]):
+        if isinstance(resource_type, str):
+            resource_type = [resource_type]
+
+        if not resource_type:
+            return self.resource_index.all()
+
+        return self.resource_index.get(resource_type)
+
+
+#a rule runs only when the template has one of its declared resource_types,
+#rules that do not declare them always run
+def rule_applies(rule, resource_index):
+    resource_types = getattr(rule, "resource_types", None)
+    return not resource_types or resource_index.has_any(resource_types)
+
+
+#types of the resources a rule reads: its resource_types and the related_types of the other
+#resources it looks up. None when the rule declares no resource_types and may read any resource
+def rule_read_types(rule):
+    resource_types = getattr(rule, "resource_types", None)
+    if not resource_types:
+        return None
+    return set(resource_types) | set(getattr(rule, "related_types", None) or ())
+
+
+#a rule that only reads the resources it reports on gives the same matches when it runs on
+#one resource at a time
+def reads_one_resource(rule):
+    return bool(getattr(rule, "resource_types", None)) and not getattr(rule, "related_types", None)
+
+
+#one instance of every rule defined in rules/custom_rules.py, ordered by id
+def load_custom_rules(module=custom_rules):
+    rule_classes = [
+        rule_class for _, rule_class in inspect.getmembers(module, inspect.isclass)
+        if issubclass(rule_class, CloudFormationLintRule) and rule_class.__module__ == module.__name__
+    ]
+
+    return [rule_class() for rule_class in sorted(rule_classes, key=lambda rule_class: rule_class.id)]
+
+
+loaded_custom_rules = load_custom_rules()
+
+
+#run the custom rules on a parsed template without cfn-lint, returns (rule, match) pairs
+#with resource_names only the rules targeting those resources run and only their matches are kept,
+#resource_index is an already built index of the template
+def run_custom_rules(template, rules=None, resource_names=None, resource_index=None):
+    cfn = TemplateShim(template, resource_index)
+
+    scope_types = None
+    if resource_names is not None:
+        resource_names = set(resource_names)
+        scope_types = {
+            cfn.resources[name].get("Type") for name in resource_names
+            if isinstance(cfn.resources.get(name), dict)
+        }
+
+    matches = []
+    for rule in loaded_custom_rules if rules is None else rules:
+        if not rule_applies(rule, cfn.resource_index):
+            continue
+
+        resource_types = getattr(rule, "resource_types", None)
+        if scope_types is not None and resource_types and scope_types.isdisjoint(resource_types):
+            continue
+
+        try:
+            rule_matches = rule.match(cfn)
+        except Exception as e:
+            print(f"Custom rule {rule.id} failed: {e}")
+            continue
+
+        for match in rule_matches or []:
+            if resource_names is not None and (len(match.path) < 2 or match.path[1] not in resource_names):
+                continue
+            matches.append((rule, match))
+
+    return matches
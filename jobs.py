@@ -0,0 +1,182 @@
+import json as js
+import queue
+import threading
+import time
+import uuid
+
+import admission
+import config
+import metrics
+import scan_service
+from lint_pool import default_regions
+from template_parser import parse_template
+
+
+job_modes = ("quickscan", "deepsearch")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+#one scan submitted through the async api
+class Job:
+
+    def __init__(self, mode, template, order_by=(), selection=None, regions=default_regions):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.template = template
+        self.order_by = tuple(order_by)
+        self.selection = selection
+        self.regions = tuple(regions)
+
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+        #notified on every status change, used by the event stream
+        self.changed = threading.Condition()
+
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def set_status(self, status, result=None, error=None):
+        with self.changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            if self.finished():
+                self.finished_at = time.time()
+                #the template is not needed anymore once the scan ended
+                self.template = None
+            self.changed.notify_all()
+
+    #wait until the status is different from the given one or the timeout expires
+    def wait_for_change(self, status, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: self.status != status, timeout)
+            return self.status
+
+    def describe(self):
+        description = {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error is not None:
+            description["error"] = self.error
+
+        return description
+
+
+#a running job holds a slot of the endpoint of its mode, like a request of that endpoint,
+#so jobs and requests together never run more scans than the limits
+job_limiters = {"quickscan": admission.quickscan_limiter, "deepsearch": admission.deepsearch_limiter}
+
+
+def run_job(job):
+    limiter = job_limiters[job.mode]
+    limiter.acquire(background=True)
+    try:
+        if job.mode == "quickscan":
+            return scan_service.quickscan(parse_template(job.template))
+
+        result = scan_service.deepsearch(job.template, job.order_by, job.selection, job.regions)
+        if not isinstance(result, str):
+            raise RuntimeError(result.get("error", "DeepSearch failed"))
+
+        return result
+    finally:
+        limiter.release()
+
+
+#bounded queue of scan jobs served by a fixed number of worker threads, the scans themselves
+#run on the lint pool so the threads mostly wait
+class JobManager:
+
+    def __init__(self, workers, max_queued, result_ttl_seconds):
+        self.workers = workers
+        self.result_ttl_seconds = result_ttl_seconds
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"scan-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.set_status("running")
+            try:
+                job.set_status("done", result=run_job(job))
+            except Exception as e:
+                job.set_status("failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        expired_before = time.time() - self.result_ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished() and job.finished_at < expired_before:
+                del self._jobs[job_id]
+
+    def submit(self, mode, template, order_by=(), selection=None, regions=default_regions):
+        job = Job(mode, template, order_by, selection, regions)
+
+        with self._lock:
+            self._start_workers()
+            self._prune()
+
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFullError("Too many scans are queued, retry later")
+
+            self._jobs[job.id] = job
+
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+
+job_manager = JobManager(config.JOBS_WORKERS, config.JOBS_MAX_QUEUED, config.JOBS_RESULT_TTL_SECONDS)
+
+metrics.registry.add_collector(lambda: metrics.jobs_queue_depth.set(job_manager.queue_depth()))
+
+
+def _event(name, data):
+    data_lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {name}\n{data_lines}\n"
+
+
+#server sent events for a job: a status event on every change and the result once it is done
+def job_events(job):
+    status = None
+    while True:
+        if job.status != status:
+            status = job.status
+            yield _event("status", js.dumps(job.describe()))
+
+            if status == "done":
+                yield _event("result", job.result)
+            if job.finished():
+                return
+
+        if job.wait_for_change(status, config.JOBS_EVENTS_KEEPALIVE_SECONDS) == status:
+            #comment line that keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
@@ -0,0 +1,33 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+#compact json of the reports, encoded with orjson when it is installed (pip install orjson).
+#the reports are kept compact in the caches, pretty printing is done per request
+
+def dumps(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            #integers beyond 64 bits and other values orjson refuses
+            pass
+
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def pretty(json_text):
+    value = loads(json_text)
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, indent=2, ensure_ascii=False)
@@ -0,0 +1,194 @@
+import copy
+
+
+#RFC 6902 JSON Patch applied with path copying: only the containers along the patched
+#paths are copied, so the original document is untouched if an operation fails
+
+
+class JsonPatchError(Exception):
+    pass
+
+
+#a "test" operation did not match, the whole patch is rejected
+class JsonPatchTestFailed(JsonPatchError):
+    pass
+
+
+#RFC 6901 pointer -> list of reference tokens
+def parse_pointer(pointer):
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _array_index(container, token, allow_end=False):
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+#RFC 6902 equality of the "test" operation: values of the same json type with equal contents.
+#python's == makes true equal to 1, and 1 equal to 1.0, which json counts as the same number
+def json_equal(left, right):
+    if isinstance(left, bool) or isinstance(right, bool):
+        return isinstance(left, bool) and isinstance(right, bool) and left == right
+    if isinstance(left, (int, float)) or isinstance(right, (int, float)):
+        return isinstance(left, (int, float)) and isinstance(right, (int, float)) and left == right
+    if isinstance(left, dict) or isinstance(right, dict):
+        return (isinstance(left, dict) and isinstance(right, dict) and left.keys() == right.keys()
+                and all(json_equal(value, right[key]) for key, value in left.items()))
+    if isinstance(left, list) or isinstance(right, list):
+        return (isinstance(left, list) and isinstance(right, list) and len(left) == len(right)
+                and all(json_equal(a, b) for a, b in zip(left, right)))
+    return type(left) is type(right) and left == right
+
+
+def _child(container, token):
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"Missing member: {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_array_index(container, token)]
+
+    raise JsonPatchError(f"Can not traverse into a scalar at {token!r}")
+
+
+def get_value(document, tokens):
+    value = document
+    for token in tokens:
+        value = _child(value, token)
+    return value
+
+
+class _PatchedDocument:
+
+    def __init__(self, document):
+        self.root = document
+        #ids of the containers already copied for this patch
+        self._copied = set()
+
+    def _own(self, container):
+        if id(container) in self._copied:
+            return container
+
+        owned = copy.copy(container)
+        self._copied.add(id(owned))
+        return owned
+
+    #copy the containers from the root down to the parent of the last token
+    def parent_for_write(self, tokens):
+        self.root = self._own(self.root)
+        parent = self.root
+        for token in tokens[:-1]:
+            if isinstance(parent, dict):
+                if token not in parent:
+                    raise JsonPatchError(f"Missing member: {token!r}")
+                parent[token] = self._own(parent[token])
+                parent = parent[token]
+            elif isinstance(parent, list):
+                index = _array_index(parent, token)
+                parent[index] = self._own(parent[index])
+                parent = parent[index]
+            else:
+                raise JsonPatchError(f"Can not traverse into a scalar at {token!r}")
+
+        if not isinstance(parent, (dict, list)):
+            raise JsonPatchError("The parent of the target is not a container")
+        return parent
+
+    def add(self, tokens, value):
+        if not tokens:
+            self.root = value
+            return
+
+        parent = self.parent_for_write(tokens)
+        if isinstance(parent, dict):
+            parent[tokens[-1]] = value
+        else:
+            parent.insert(_array_index(parent, tokens[-1], allow_end=True), value)
+
+    def remove(self, tokens):
+        if not tokens:
+            raise JsonPatchError("The whole document can not be removed")
+
+        parent = self.parent_for_write(tokens)
+        if isinstance(parent, dict):
+            if tokens[-1] not in parent:
+                raise JsonPatchError(f"Missing member: {tokens[-1]!r}")
+            return parent.pop(tokens[-1])
+
+        return parent.pop(_array_index(parent, tokens[-1]))
+
+    def replace(self, tokens, value):
+        if not tokens:
+            self.root = value
+            return
+
+        get_value(self.root, tokens)
+        parent = self.parent_for_write(tokens)
+        if isinstance(parent, dict):
+            parent[tokens[-1]] = value
+        else:
+            parent[_array_index(parent, tokens[-1])] = value
+
+
+def _operation_value(operation):
+    if "value" not in operation:
+        raise JsonPatchError(f"The {operation['op']} operation needs a value")
+    return operation["value"]
+
+
+#apply the operations and return the patched document, the input document is never modified
+def apply_patch(document, operations):
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON patch must be an array of operations")
+
+    patched = _PatchedDocument(document)
+
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JsonPatchError(f"Invalid operation: {operation!r}")
+
+        op = operation["op"]
+        tokens = parse_pointer(operation["path"])
+
+        if op == "add":
+            patched.add(tokens, copy.deepcopy(_operation_value(operation)))
+        elif op == "remove":
+            patched.remove(tokens)
+        elif op == "replace":
+            patched.replace(tokens, copy.deepcopy(_operation_value(operation)))
+        elif op == "move":
+            from_tokens = parse_pointer(operation.get("from"))
+            if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                raise JsonPatchError("A value can not be moved into one of its children")
+            value = patched.remove(from_tokens)
+            patched.add(tokens, value)
+        elif op == "copy":
+            value = get_value(patched.root, parse_pointer(operation.get("from")))
+            patched.add(tokens, copy.deepcopy(value))
+        elif op == "test":
+            if not json_equal(get_value(patched.root, tokens), _operation_value(operation)):
+                raise JsonPatchTestFailed(f"Test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+
+    return patched.root
+
+
+#pointers an operation writes to or reads from, as token lists
+def operation_paths(operation):
+    paths = [parse_pointer(operation["path"])]
+    if operation.get("op") in ("move", "copy"):
+        paths.append(parse_pointer(operation.get("from")))
+    return paths
@@ -0,0 +1,360 @@
+import copy
+import inspect
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from cfnlint.config import ConfigMixIn
+from cfnlint.decode.decode import decode_str
+from cfnlint.helpers import REGIONS
+from cfnlint.rules import Rules
+from cfnlint.runner import Runner, run_template_by_data
+
+import config
+
+
+#the custom rules are loaded from an absolute path so linting does not depend on the cwd
+custom_rules_dir = str(Path(__file__).parent / "rules")
+
+default_regions = ("us-east-1",)
+supported_regions = frozenset(REGIONS)
+
+#small template linted by every new worker so the region schemas are loaded before the first job
+warm_template = '{"Resources": {"WarmBucket": {"Type": "AWS::S3::Bucket"}}}'
+
+
+#picklable copy of the parts of a cfn-lint match the reports use, regions is only set by
+#multi-region lints. line and column (zero based) come from the marks of cfn-lint's decode,
+#so the reports need no second parse of the template to place the matches
+LintRule = namedtuple("LintRule", ["id", "description"])
+LintMatch = namedtuple("LintMatch", ["path", "message", "rule", "regions", "line", "column"],
+                       defaults=[None, None, None])
+
+#rule ids and tags of a targeted lint, every field is a sorted tuple so the selection can be
+#hashed, cached and sent to the workers. the ids are matched exactly
+RuleSelection = namedtuple("RuleSelection", ["rules", "exclude_rules", "tags", "exclude_tags"])
+
+
+def rule_selection(rules=(), exclude_rules=(), tags=(), exclude_tags=()):
+    selection = RuleSelection(*(tuple(sorted(set(values))) for values in (rules, exclude_rules, tags, exclude_tags)))
+    if not any(selection):
+        return None
+    return selection
+
+
+#the decoded template uses str/dict subclasses that can not leave the worker process
+def _plain(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return int(value)
+    return str(value)
+
+
+def copy_match(match):
+    line = getattr(match, "linenumber", None)
+    column = getattr(match, "columnnumber", None)
+    return LintMatch(
+        [_plain(item) for item in match.path],
+        str(match.message),
+        LintRule(str(match.rule.id), str(match.rule.description)),
+        line=int(line) - 1 if line else None,
+        column=int(column) - 1 if column else None,
+    )
+
+
+#the template text could not be decoded, e.g. invalid json/yaml, duplicate keys or a value
+#that is not a mapping
+class TemplateDecodeError(Exception):
+    pass
+
+
+#set in the worker processes, where linting always runs in process
+in_worker = False
+
+
+@lru_cache(maxsize=16)
+def _lint_config(regions):
+    return ConfigMixIn(regions=list(regions), append_rules=[custom_rules_dir])
+
+
+#the rules are loaded once per thread and reused by its lints. some rules keep the state of
+#the template they run on (initialize/configure), so two threads linting in process (pool
+#size 0, inline() profiles) never share a rule set
+_rules_local = threading.local()
+
+#targeted rule sets kept per thread
+selected_rules_cache_size = 64
+
+
+def _lint_rules():
+    rules = getattr(_rules_local, "rules", None)
+    if rules is None:
+        rules = _rules_local.rules = Runner(_lint_config(default_regions)).rules
+        _rules_local.selected = {}
+    return rules
+
+
+def rule_selected(rule, selection):
+    tags = set(rule.tags or ())
+    if rule.id in selection.exclude_rules or tags.intersection(selection.exclude_tags):
+        return False
+    if not selection.rules and not selection.tags:
+        return True
+    return rule.id in selection.rules or bool(tags.intersection(selection.tags))
+
+
+#rules that walk the template for other rules: the parents of child rules and the intrinsic
+#function rules, which validate each other (e.g. Fn::Sub goes through the Ref rule). they
+#always run so a selected rule is reached the same way as in a full lint
+@lru_cache(maxsize=1)
+def _structural_rule_ids():
+    all_rules = _lint_rules().data
+    structural_ids = set()
+    for rule_id, rule in all_rules.items():
+        if rule.child_rules or "functions" in (rule.tags or ()):
+            structural_ids.add(rule_id)
+        structural_ids.update(parent_id for parent_id in rule.parent_rules if parent_id in all_rules)
+    return frozenset(structural_ids)
+
+
+def _reads_regions(rule):
+    for cls in type(rule).__mro__:
+        for attribute in vars(cls).values():
+            function = getattr(attribute, "__func__", attribute)
+            if not inspect.isfunction(function):
+                continue
+            try:
+                if "regions" in inspect.getsource(function):
+                    return True
+            except (OSError, TypeError):
+                continue
+    return False
+
+
+#rules whose findings depend on the region of the lint: the rules reading the regions (the
+#regional schemas, GetAtt/Ref formats, lambda runtimes...) and the intrinsic function rules,
+#whose values are resolved per region. a parent and the rules it runs validate together (the
+#keyword rules of a schema extend the validator of their parent) so a tree of parent and
+#child rules is regional as soon as one of its rules is. the other rules (the custom rules
+#among them) give the same findings in every region
+@lru_cache(maxsize=1)
+def _regional_rule_ids():
+    all_rules = _lint_rules().data
+
+    linked = {rule_id: set() for rule_id in all_rules}
+    for rule_id, rule in all_rules.items():
+        for other_id in (*rule.child_rules, *rule.parent_rules):
+            if other_id in all_rules:
+                linked[rule_id].add(other_id)
+                linked[other_id].add(rule_id)
+
+    regional_ids = {rule_id for rule_id, rule in all_rules.items()
+                    if "functions" in (rule.tags or ()) or _reads_regions(rule)}
+    pending = list(regional_ids)
+    while pending:
+        for other_id in linked[pending.pop()] - regional_ids:
+            regional_ids.add(other_id)
+            pending.append(other_id)
+
+    return frozenset(regional_ids)
+
+
+#the selected rules plus the structural rules, the other rules never run. a child rule left
+#out of the selection is disabled by unlinking it from a copy of its parent, the rules of the
+#full lint are never changed. part narrows the rules to the regional ones or to the others
+#("global"), a global lint does not run the regional structural rules either
+def _selected_rules(selection, part=None):
+    all_rules = _lint_rules().data
+    cached = _rules_local.selected.get((selection, part))
+    if cached is not None:
+        return cached
+
+    if selection is None:
+        selected_ids = frozenset(all_rules)
+    else:
+        selected_ids = frozenset(rule_id for rule_id, rule in all_rules.items() if rule_selected(rule, selection))
+    structural_ids = _structural_rule_ids()
+    if part == "regional":
+        selected_ids &= _regional_rule_ids()
+    elif part == "global":
+        selected_ids -= _regional_rule_ids()
+        structural_ids -= _regional_rule_ids()
+    run_ids = selected_ids | structural_ids
+
+    rules = {}
+    for rule_id, rule in all_rules.items():
+        if rule_id not in run_ids:
+            continue
+        if rule.child_rules:
+            rule = copy.copy(rule)
+            rule.child_rules = {child_id: child if child_id in run_ids else None
+                                for child_id, child in rule.child_rules.items()}
+        rules[rule_id] = rule
+
+    if len(_rules_local.selected) >= selected_rules_cache_size:
+        _rules_local.selected.clear()
+    cached = _rules_local.selected[(selection, part)] = (Rules(rules), selected_ids)
+    return cached
+
+
+def _run_selected_rules(parsed_template, regions, selection, part=None):
+    rules, selected_ids = _selected_rules(selection, part)
+
+    matches = run_template_by_data(parsed_template, _lint_config(tuple(regions)), rules)
+
+    #the structural rules only run to reach the selected ones, their own matches are dropped.
+    #rule errors (E0002) are not part of the rule set and are always kept
+    all_rules = _lint_rules().data
+    return [match for match in matches if match.rule.id in selected_ids or match.rule.id not in all_rules]
+
+
+def decode_template(template):
+    parsed_template, errors = decode_str(template)
+
+    if errors:
+        messages = [str(error.message) for error in errors]
+        if len(messages) > 5:
+            messages = messages[:5] + [f"{len(messages) - 5} more errors"]
+        raise TemplateDecodeError("; ".join(messages))
+    #cfn-lint reports a list or a scalar with a match that has no path
+    if parsed_template is not None and not isinstance(parsed_template, dict):
+        raise TemplateDecodeError("The template must be a json or yaml mapping")
+
+    return parsed_template
+
+
+#lint a template string in the current process
+def lint_in_process(template, regions=default_regions, selection=None):
+    parsed_template = decode_template(template)
+
+    if parsed_template is None:
+        matches = []
+    elif selection is not None:
+        matches = _run_selected_rules(parsed_template, regions, selection)
+    else:
+        matches = run_template_by_data(parsed_template, _lint_config(tuple(regions)), _lint_rules())
+
+    return [copy_match(match) for match in matches]
+
+
+#lint a template string for several regions in the current process with one decode. the
+#global rules run once and their matches have no regions, the regional rules run per region
+#and a finding reported in several regions is merged into one match with the list of its
+#regions. the transforms rewrite the template they run on, a template with one is copied per run
+def lint_regions_in_process(template, regions, selection=None):
+    parsed_template = decode_template(template)
+    if parsed_template is None:
+        return []
+
+    def template_copy():
+        return copy.deepcopy(parsed_template) if "Transform" in parsed_template else parsed_template
+
+    matches = [copy_match(match) for match in _run_selected_rules(template_copy(), regions, selection, "global")]
+
+    merged = {}
+    for region in regions:
+        for match in _run_selected_rules(template_copy(), (region,), selection, "regional"):
+            match = copy_match(match)
+            key = (tuple(match.path), match.message, match.rule.id)
+            if key not in merged:
+                merged[key] = match._replace(regions=[])
+            merged[key].regions.append(region)
+
+    return matches + list(merged.values())
+
+
+def _warm_worker():
+    global in_worker
+    in_worker = True
+
+    lint_in_process(warm_template)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool_size():
+    if config.LINT_POOL_SIZE < 0:
+        return os.cpu_count() or 1
+    return config.LINT_POOL_SIZE
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            #spawned workers never inherit the state of the threads serving requests
+            _executor = ProcessPoolExecutor(
+                max_workers=pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+                max_tasks_per_child=config.LINT_POOL_MAX_JOBS or None,
+            )
+
+    return _executor
+
+
+#start every worker ahead of the first request, so rule and schema loading is off the hot path
+def start():
+    if pool_size() <= 0 or in_worker:
+        return
+
+    executor = get_executor()
+    warm_jobs = [executor.submit(os.getpid) for _ in range(pool_size())]
+    for job in warm_jobs:
+        job.result()
+
+
+def shutdown():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+#run fn on the pool, or right away when the pool is disabled or we already are in a worker
+#jobs submitted by the current thread run in the thread itself, used by the profiler
+_local = threading.local()
+
+
+@contextmanager
+def inline():
+    previous = getattr(_local, "inline", False)
+    _local.inline = True
+    try:
+        yield
+    finally:
+        _local.inline = previous
+
+
+def submit(fn, *args):
+    if pool_size() <= 0 or in_worker or getattr(_local, "inline", False):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    return get_executor().submit(fn, *args)
+
+
+def lint(template, regions=default_regions, selection=None):
+    return submit(lint_in_process, template, tuple(regions), selection).result()
+
+
+#lint the template for every region at once in one worker, the template is decoded once and
+#only the regional rules run for every region (see lint_regions_in_process)
+def lint_regions(template, regions=default_regions, selection=None):
+    if len(regions) == 1:
+        return lint(template, regions, selection)
+
+    return submit(lint_regions_in_process, template, tuple(regions), selection).result()
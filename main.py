@@ -1,59 +1,355 @@
-from flask import Flask, request, send_from_directory
-from QuickScan import threat_check
-from DeepSearch import generate_deepsearch_result, lint_cloudformation_template
-from utilities import save_file, delete_folder
-import os
+from flask import Flask, Response, g, request, send_from_directory, stream_with_context, url_for
+from DeepSearch import ordering_keys, stream_deepsearch_result, stream_error_record
+import admission
+import config
+import lint_pool
+import metrics
+import profiling
+import responses
+import scan_service
+import static_assets
+from batch import run_batch, templates_from_json, templates_from_archive, batch_modes, BatchError
+from jobs import job_manager, job_events, job_modes, QueueFullError
+from sessions import session_store, SessionError
+from json_patch import JsonPatchError, JsonPatchTestFailed
+from template_parser import parse_template, TemplateParseError
+from template_stream import iter_resources, TemplateStreamError
+from QuickScan import threat_check_resources
+import itertools
+import time
 
 
 # fix CORS
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
 
 #IMPORTANT -> BEFORE RUNNING THE CODE YOU HAVE TO BUILD THE VITE PROJECT (npm run build)
 app = Flask(__name__, static_folder='./dist')
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_BODY_BYTES
+app.json = responses.JSONProvider(app)
 
-CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST"], "allow_headers": ["Content-Type", "Authorization"]}})
+#the profile header is only allowed when profiling by header is enabled
+cors_headers = ["Content-Type", "Authorization"] + ([profiling.profile_header] if profiling.header_enabled() else [])
+CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "PATCH", "DELETE"], "allow_headers": cors_headers, "expose_headers": [profiling.profile_id_header, "ETag"]}})
+
+#optional secondary ordering of the findings, e.g. ?order_by=resource,line
+def parse_order_by():
+    order_by = [key for key in request.args.get("order_by", "").split(",") if key]
+    unknown_keys = [key for key in order_by if key not in ordering_keys]
+    if unknown_keys:
+        raise ValueError(f"Unknown order_by keys: {', '.join(unknown_keys)}")
+
+    return order_by
+
+#regions the deep search lints, e.g. ?regions=us-east-1,eu-west-1
+def parse_regions():
+    regions = list(dict.fromkeys(region.strip() for region in request.args.get("regions", "").split(",") if region.strip()))
+    if not regions:
+        return lint_pool.default_regions
+
+    unknown_regions = [region for region in regions if region not in lint_pool.supported_regions]
+    if unknown_regions:
+        raise ValueError(f"Unknown regions: {', '.join(unknown_regions)}")
+    if len(regions) > config.DEEPSEARCH_MAX_REGIONS:
+        raise ValueError(f"At most {config.DEEPSEARCH_MAX_REGIONS} regions can be linted at once")
+
+    return tuple(regions)
+
+#optional rule selection of the deep search, e.g. ?tags=s3,iam&exclude_rules=W3005
+#the rule ids are matched exactly, a rule is kept when its id or one of its tags is selected
+def parse_rule_selection():
+    def values(name):
+        return [value.strip() for value in request.args.get(name, "").split(",") if value.strip()]
+
+    return lint_pool.rule_selection(values("rules"), values("exclude_rules"), values("tags"), values("exclude_tags"))
+
+#read the body of the request, timing it and recording its size
+def read_body(endpoint, as_text=True):
+    with metrics.stage(endpoint, "body_read"):
+        body = request.get_data(as_text=as_text)
+    metrics.template_size_bytes.observe(request.content_length or len(body), endpoint=endpoint)
+
+    return body
+
+#smaller body caps of the endpoints that hold the whole template in memory
+body_limits = {
+    "quick_scan": config.QUICKSCAN_MAX_BODY_BYTES,
+    "deep_search": config.DEEPSEARCH_MAX_BODY_BYTES,
+    "submit_job": config.DEEPSEARCH_MAX_BODY_BYTES,
+    "create_session": config.QUICKSCAN_MAX_BODY_BYTES,
+}
+
+def body_limit():
+    if request.endpoint == "quick_scan" and request.args.get("stream") == "1":
+        return config.QUICKSCAN_STREAM_MAX_BODY_BYTES
+    return body_limits.get(request.endpoint)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+    #a body without content length is cut when it is read
+    limit = body_limit()
+    if limit is not None:
+        request.max_content_length = limit
+        if (request.content_length or 0) > request.max_content_length:
+            raise RequestEntityTooLarge()
+
+@app.errorhandler(RequestEntityTooLarge)
+def body_too_large(e):
+    endpoint = request.url_rule.rule.removeprefix("/api/") if request.url_rule else request.path
+    metrics.admission_rejections_total.inc(endpoint=endpoint, reason="body_too_large")
+    return {"error": f"The request body is bigger than {request.max_content_length} bytes"}, 413
+
+#every api response is counted by endpoint and status code
+@app.after_request
+def record_request(response):
+    if request.path.startswith("/api/") and request.url_rule is not None:
+        endpoint = request.url_rule.rule
+        metrics.requests_total.inc(endpoint=endpoint, status=response.status_code)
+        metrics.request_duration_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+
+    return response
+
+#registered after record_request so it runs first and the compression time is counted
+@app.after_request
+def compress_response(response):
+    if request.path.startswith("/api/") and request.url_rule is not None:
+        response = responses.compress_response(response, request.url_rule.rule.removeprefix("/api/"))
+
+    return response
 
 #endpoint to retrieve the informations relative to the quickscan output
 @app.route("/api/quickscan", methods=["POST"])
+@admission.admitted(admission.quickscan_limiter)
+@profiling.profiled("quickscan")
 def quick_scan():
 
-    user_data = request.get_json()
+    #streaming mode for very big json templates, the resources are checked while the body is read
+    if request.args.get("stream") == "1":
+        if request.content_length:
+            metrics.template_size_bytes.observe(request.content_length, endpoint="quickscan")
+        try:
+            return responses.json_response(threat_check_resources(iter_resources(request.stream)))
+        except TemplateStreamError as e:
+            return {"error": str(e)}, 400
+
+    #json or yaml template
+    raw_user_data = read_body("quickscan")
+    try:
+        with metrics.stage("quickscan", "parse"):
+            user_data = parse_template(raw_user_data)
+    except TemplateParseError as e:
+        return {"error": str(e)}, 400
 
-    return_json = threat_check(user_data)
+    cache_key = scan_service.quickscan_key(user_data)
+    if responses.not_modified(cache_key):
+        return responses.not_modified_response(cache_key)
 
-    return return_json
+    return_json = scan_service.quickscan(user_data, cache_key)
+
+    return responses.json_response(return_json, cache_key)
 
 #endpoint to retreve the informations relative to the deepsearch output
 @app.route("/api/deepsearch", methods=['POST'])
+@admission.admitted(admission.deepsearch_limiter)
+@profiling.profiled("deepsearch")
 def deep_search():
 
-    raw_user_data = request.get_data(as_text=True)
-    
-    save_file(raw_user_data)
+    raw_user_data = read_body("deepsearch")
+
+    try:
+        order_by = parse_order_by()
+        regions = parse_regions()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    selection = parse_rule_selection()
+
+    #streaming mode, every finding is sent as a json line as soon as it is ready. the template
+    #is linted with the first record, so a template cfn-lint can not decode is still a 400
+    if request.args.get("stream") == "1" or request.accept_mimetypes.best == "application/x-ndjson":
+        records = stream_deepsearch_result(raw_user_data, order_by, selection, regions)
+        try:
+            first_record = next(records)
+        except lint_pool.TemplateDecodeError as e:
+            return Response(stream_error_record(str(e)), status=400, mimetype="application/x-ndjson")
+
+        return Response(stream_with_context(itertools.chain([first_record], records)),
+                        mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+    cache_key = scan_service.deepsearch_key(raw_user_data, order_by, selection, regions)
+    if responses.not_modified(cache_key):
+        return responses.not_modified_response(cache_key)
+
+    try:
+        return_json = scan_service.deepsearch(raw_user_data, order_by, selection, regions, cache_key)
+    except lint_pool.TemplateDecodeError as e:
+        return {"error": str(e)}, 400
+
+    #a failed lint returns an error dict
+    if not isinstance(return_json, str):
+        return return_json
+
+    return responses.json_response(return_json, cache_key)
+
+#prometheus metrics of the api, the scan stages and the result cache
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+#endpoint to submit a scan that runs in the background, returns the id of the job right away
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+
+    mode = request.args.get("mode", "deepsearch")
+    if mode not in job_modes:
+        return {"error": f"mode must be one of {', '.join(job_modes)}"}, 400
+
+    try:
+        order_by = parse_order_by()
+        regions = parse_regions()
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        job = job_manager.submit(mode, request.get_data(as_text=True), order_by, parse_rule_selection(), regions)
+    except QueueFullError as e:
+        return {"error": str(e)}, 503, {"Retry-After": str(config.JOBS_RETRY_AFTER_SECONDS)}
+
+    response = job.describe()
+    response["status_url"] = url_for("job_status", job_id=job.id)
+    response["result_url"] = url_for("job_result", job_id=job.id)
+    response["events_url"] = url_for("job_stream", job_id=job.id)
+
+    return response, 202, {"Location": response["status_url"]}
+
+#endpoint to poll the status of a job
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": "Unknown job"}, 404
+
+    return job.describe()
+
+#endpoint to retrieve the output of a finished job, the same json the sync endpoints return
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": "Unknown job"}, 404
+    if job.status == "failed":
+        return job.describe(), 500
+    if job.status != "done":
+        return job.describe(), 202, {"Retry-After": "1"}
+
+    return responses.json_response(job.result)
+
+#endpoint streaming the status changes and the result of a job as server sent events
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_stream(job_id):
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return {"error": "Unknown job"}, 404
+
+    return Response(stream_with_context(job_events(job)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+#endpoint to open an incremental scan session, the template is kept on the server
+@app.route("/api/sessions", methods=["POST"])
+@admission.admitted(admission.quickscan_limiter)
+def create_session():
+
+    try:
+        session = session_store.create(parse_template(request.get_data(as_text=True)))
+    except (SessionError, TemplateParseError) as e:
+        return {"error": str(e)}, 400
+
+    with session.lock:
+        return {"session_id": session.id, "findings": session.report()}, 201
+
+#endpoint to retrieve the current findings of a session
+@app.route("/api/sessions/<session_id>", methods=["GET"])
+def get_session(session_id):
+
+    session = session_store.get(session_id)
+    if session is None:
+        return {"error": "Unknown session"}, 404
+
+    with session.lock:
+        return {"session_id": session.id, "findings": session.report()}
+
+#endpoint to send a RFC 6902 JSON patch, only the resources it touches are rescanned
+@app.route("/api/sessions/<session_id>", methods=["PATCH"])
+def patch_session(session_id):
+
+    session = session_store.get(session_id)
+    if session is None:
+        return {"error": "Unknown session"}, 404
+
+    with session.lock:
+        try:
+            rescanned = session.apply(request.get_json())
+        except JsonPatchTestFailed as e:
+            return {"error": str(e)}, 409
+        except (JsonPatchError, SessionError) as e:
+            return {"error": str(e)}, 400
+
+        return {"session_id": session.id, "rescanned": rescanned, "findings": session.report()}
+
+@app.route("/api/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+
+    if not session_store.delete(session_id):
+        return {"error": "Unknown session"}, 404
+
+    return "", 204
+
+#endpoint to scan many templates in one request, posted as json or as a zip archive
+@app.route("/api/batch", methods=["POST"])
+@admission.admitted(admission.batch_limiter)
+def batch_scan():
 
-    scan_results = lint_cloudformation_template("./user_data/line_mapping.json")
+    modes = [mode for mode in request.args.get("mode", ",".join(batch_modes)).split(",") if mode]
+    unknown_modes = [mode for mode in modes if mode not in batch_modes]
+    if unknown_modes or not modes:
+        return {"error": f"mode must be a list of {', '.join(batch_modes)}"}, 400
 
-    return_json = generate_deepsearch_result(scan_results)
+    try:
+        if request.mimetype in ("application/zip", "application/x-zip-compressed"):
+            templates = templates_from_archive(read_body("batch", as_text=False))
+        else:
+            templates = templates_from_json(read_body("batch"))
 
-    delete_folder()
+        return_json = run_batch(templates, modes)
+    except BatchError as e:
+        return {"error": str(e)}, 400
 
-    return return_json
+    return responses.json_response(return_json)
 
-#frontend route
+#frontend route, the files of dist/ are served from memory
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
     #add a check to ignore API routes
     if path.startswith('api/'):
-        return
+        return {"error": "Unknown endpoint"}, 404
 
     #if the file exixt return it else return index
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    assets = static_assets.frontend_assets(app.static_folder)
+    asset = assets.get(path) or assets.get("index.html")
+    if asset is None:
+        return "The frontend is not built, run npm run build", 404
 
+    return static_assets.asset_response(asset)
 
 if __name__ == "__main__":
+    lint_pool.start()
+    static_assets.frontend_assets(app.static_folder)
     app.run(debug=True, port=8080)
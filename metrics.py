@@ -0,0 +1,178 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+#minimal Prometheus instrumentation, metrics are kept in memory and rendered in the text
+#exposition format by /api/metrics
+
+default_duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+size_buckets = tuple(1024 * 4 ** i for i in range(10))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} needs the labels {', '.join(self.label_names)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=default_duration_buckets):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, [("le", _format_number(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_number(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+        #callbacks run before every render, to copy values kept elsewhere (e.g. the cache)
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        for collector in self._collectors:
+            collector()
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "tirith_requests_total", "API requests by endpoint and status code", ["endpoint", "status"]))
+request_duration_seconds = registry.register(Histogram(
+    "tirith_request_duration_seconds", "API request duration until the response is returned", ["endpoint"]))
+stage_duration_seconds = registry.register(Histogram(
+    "tirith_stage_duration_seconds", "Duration of every stage of the scan pipelines", ["endpoint", "stage"]))
+template_size_bytes = registry.register(Histogram(
+    "tirith_template_size_bytes", "Size of the submitted templates", ["endpoint"], buckets=size_buckets))
+findings_total = registry.register(Counter(
+    "tirith_findings_total", "Findings produced by the scans", ["endpoint"]))
+cache_events_total = registry.register(Counter(
+    "tirith_cache_events_total", "Result cache lookups and evictions", ["event"]))
+cache_entries = registry.register(Gauge(
+    "tirith_cache_entries", "Results currently held by the cache"))
+cache_bytes = registry.register(Gauge(
+    "tirith_cache_bytes", "Bytes currently held by the cache"))
+admission_active = registry.register(Gauge(
+    "tirith_admission_active", "Scans currently running by endpoint", ["endpoint"]))
+admission_queue_depth = registry.register(Gauge(
+    "tirith_admission_queue_depth", "Requests waiting for a free scan slot by endpoint", ["endpoint"]))
+admission_wait_seconds = registry.register(Histogram(
+    "tirith_admission_wait_seconds", "Time spent waiting for a free scan slot", ["endpoint"]))
+admission_rejections_total = registry.register(Counter(
+    "tirith_admission_rejections_total", "Rejected scan requests by endpoint and reason", ["endpoint", "reason"]))
+jobs_queue_depth = registry.register(Gauge(
+    "tirith_jobs_queue_depth", "Async scan jobs waiting for a worker"))
+
+
+#time a stage of a pipeline, e.g. with stage("deepsearch", "lint"):
+@contextmanager
+def stage(endpoint, stage_name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration_seconds.observe(time.perf_counter() - start, endpoint=endpoint, stage=stage_name)
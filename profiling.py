@@ -0,0 +1,133 @@
+import cProfile
+import hmac
+import random
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+from flask import make_response, request
+
+import config
+import lint_pool
+
+
+#opt-in profiling of single scan requests, triggered by the X-Tirith-Profile: <token> header
+#(TIRITH_PROFILE_HEADER=1 and TIRITH_PROFILE_TOKEN) or by sampling. every profile is saved as <id>.pstats (cProfile) and <id>.collapsed (sampled
+#stacks, for flamegraph.pl or speedscope) in config.PROFILE_DIR
+
+profile_header = "X-Tirith-Profile"
+profile_id_header = "X-Tirith-Profile-Id"
+
+#one profile at a time, this bounds the overhead and cProfile can not run twice at once on python 3.12+
+_profile_lock = threading.Lock()
+_local = threading.local()
+
+
+#true while the current thread runs a profiled request, the scan service skips the cache then
+def is_active():
+    return getattr(_local, "active", False)
+
+
+def header_enabled():
+    return bool(config.PROFILE_HEADER and config.PROFILE_TOKEN)
+
+
+def should_profile():
+    if header_enabled() and hmac.compare_digest(request.headers.get(profile_header, "").encode(),
+                                                config.PROFILE_TOKEN.encode()):
+        return True
+    return config.PROFILE_SAMPLE_EVERY > 0 and random.randrange(config.PROFILE_SAMPLE_EVERY) == 0
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+#samples the stack of one thread from a background thread
+class StackSampler:
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _rotate(directory):
+    if config.PROFILE_KEEP <= 0:
+        return
+
+    #the ids start with the time, so the oldest profiles sort first
+    profiles = sorted(directory.glob("*.pstats"))
+    for old_profile in profiles[:-config.PROFILE_KEEP]:
+        old_profile.unlink(missing_ok=True)
+        old_profile.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+def save_profile(profile_id, profiler, sampler):
+    directory = Path(config.PROFILE_DIR)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f"{profile_id}.pstats")
+        (directory / f"{profile_id}.collapsed").write_text(sampler.collapsed())
+        _rotate(directory)
+    except OSError as e:
+        print(f"Error saving the profile {profile_id}: {e}")
+
+
+#wraps a scan endpoint, a profiled request lints in the request thread so cfn-lint and the
+#custom rules show up in the profile. streamed responses are profiled until the handler returns
+def profiled(endpoint):
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            if not should_profile() or not _profile_lock.acquire(blocking=False):
+                return handler(*args, **kwargs)
+
+            profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+            profiler = cProfile.Profile()
+            sampler = StackSampler(threading.get_ident(), config.PROFILE_STACK_INTERVAL_MS / 1000)
+
+            try:
+                _local.active = True
+                sampler.start()
+                with lint_pool.inline():
+                    response = make_response(profiler.runcall(handler, *args, **kwargs))
+            finally:
+                sampler.stop()
+                _local.active = False
+                save_profile(profile_id, profiler, sampler)
+                _profile_lock.release()
+
+            response.headers[profile_id_header] = profile_id
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,113 @@
+import gzip
+
+from flask import Response, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+import config
+import metrics
+import profiling
+from json_encoding import dumps, loads, pretty
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+#json responses of the api: compact unless ?pretty=1, an ETag from the result key and
+#compression negotiated from Accept-Encoding. brotli is used when the package is installed
+
+json_mimetype = "application/json"
+
+
+#dict responses (errors, jobs, sessions) are encoded like the reports: compact unless
+#?pretty=1, also in debug mode
+class JSONProvider(DefaultJSONProvider):
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._compact(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        json_text = self._compact(self._prepare_response_obj(args, kwargs))
+        if has_request_context() and wants_pretty():
+            json_text = pretty(json_text)
+
+        return self._app.response_class(f"{json_text}\n", mimetype=self.mimetype)
+
+    #values only the flask encoder knows (dates, uuids, dataclasses) go through it
+    def _compact(self, obj):
+        try:
+            return dumps(obj)
+        except TypeError:
+            return super().dumps(obj, separators=(",", ":"))
+
+
+def wants_pretty():
+    return request.args.get("pretty") == "1"
+
+
+#the pretty and compact bodies are different representations of the result. the ETag is weak
+#because the compressed and identity bodies share it
+def etag_for(cache_key):
+    return f"{cache_key}-pretty" if wants_pretty() else cache_key
+
+
+#true when the client already has the result of this key. a profiled request always scans
+def not_modified(cache_key):
+    return not profiling.is_active() and request.if_none_match.contains_weak(etag_for(cache_key))
+
+
+def not_modified_response(cache_key):
+    response = Response(status=304)
+    response.set_etag(etag_for(cache_key), weak=True)
+    return response
+
+
+#response of an already encoded json report
+def json_response(json_text, cache_key=None):
+    if wants_pretty():
+        json_text = pretty(json_text)
+
+    response = Response(json_text, mimetype=json_mimetype)
+    if cache_key is not None:
+        response.set_etag(etag_for(cache_key), weak=True)
+    return response
+
+
+def _encoding():
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(candidates)
+
+
+#compresses the buffered json responses, streamed ones (ndjson, server sent events) are
+#sent as they are so every line reaches the client right away
+def compress_response(response, endpoint):
+    if (response.is_streamed or response.mimetype != json_mimetype or response.status_code < 200
+            or response.status_code in (204, 304) or "Content-Encoding" in response.headers):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < config.RESPONSE_COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = _encoding()
+    if encoding is None:
+        return response
+
+    with metrics.stage(endpoint, "compress"):
+        if encoding == "br":
+            body = brotli.compress(body, quality=config.RESPONSE_BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, compresslevel=config.RESPONSE_GZIP_LEVEL)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
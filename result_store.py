@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import config
+from cache import rules_fingerprint
+
+
+#scan results kept on disk between runs, keyed like the in memory cache (cache.result_key:
+#mode, template content, options, rule set fingerprint and cfn-lint version). the rows of
+#another rule set are pruned when the store is opened, as are the rows unused for too long
+
+#a prune also runs after this many writes, for long running services
+prune_every_writes = 500
+
+
+class ResultStore:
+
+    def __init__(self, path, max_entries, max_age_days):
+        #absolute, so a later change of the working directory does not move the store
+        self.path = str(Path(path).resolve()) if path else ""
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.enabled = bool(path)
+
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._pruned = False
+
+    #one connection per thread, sqlite connections can not be shared between threads
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL, used_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)")
+            self._local.connection = connection
+
+        with self._lock:
+            prune = not self._pruned
+            self._pruned = True
+        if prune:
+            self._prune(connection)
+
+        return connection
+
+    #a broken store never fails a scan, it only stops answering
+    def _run(self, operation, default):
+        if not self.enabled:
+            return default
+
+        try:
+            return operation(self._connection())
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error using the result store {self.path}: {e}")
+            return default
+
+    def get_many(self, keys):
+        def operation(connection):
+            found = {}
+            keys_list = list(keys)
+            #sqlite limits the number of parameters of a query
+            for start in range(0, len(keys_list), 500):
+                chunk = keys_list[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(connection.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({placeholders})", chunk
+                ))
+
+            with connection:
+                connection.executemany("UPDATE results SET used_at = ? WHERE key = ?",
+                                       [(time.time(), key) for key in found])
+            return found
+
+        return self._run(operation, {})
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        items = list(items)
+
+        def operation(connection):
+            fingerprint = rules_fingerprint()
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results (key, fingerprint, value, used_at) VALUES (?, ?, ?, ?)",
+                    [(key, fingerprint, value, now) for key, value in items],
+                )
+
+            with self._lock:
+                self._writes += len(items)
+                prune = self._writes >= prune_every_writes
+                if prune:
+                    self._writes = 0
+            if prune:
+                self._prune(connection)
+
+        self._run(operation, None)
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def _prune(self, connection):
+        with connection:
+            connection.execute("DELETE FROM results WHERE fingerprint != ?", (rules_fingerprint(),))
+            connection.execute("DELETE FROM results WHERE used_at < ?", (time.time() - self.max_age_seconds,))
+            connection.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+result_store = ResultStore(config.RESULT_STORE_PATH, config.RESULT_STORE_MAX_ENTRIES, config.RESULT_STORE_MAX_AGE_DAYS)
@@ -17,6 +17,8 @@ def s3_check_public_access(list_of_s3_rules, value):
 
 def s3_check_encryption(value):
     dangerous_rules = {}
+    #buckets without a BucketEncryption block have no algorithm
+    path = None
     try:
         path = value['Properties']['BucketEncryption']['ServerSideEncryptionConfiguration'][0]['ServerSideEncryptionByDefault']['SSEAlgorithm']
         path_2 = value['Properties']['BucketEncryption']['ServerSideEncryptionConfiguration'][0]['ServerSideEncryptionByDefault']['KMSMasterKeyID']
@@ -1,11 +1,19 @@
 from cfnlint.rules import CloudFormationLintRule, RuleMatch
 
+#resource_types and related_types are read by the quick scan engine only (custom_rule_engine):
+#rule_applies skips a rule when the template has none of its resource_types, and the streamed
+#scan keeps the resources of these types for the rules that read other resources. the deep
+#search runs these rules through cfn-lint, which ignores both attributes, match() filters the
+#resources itself with cfn.get_resources. a new rule must list every type it reports on in
+#resource_types and every other type it reads in related_types
+
 
 class CustomS3PublicAccessBlockRule(CloudFormationLintRule):
     id = 'E01'
     shortdesc = 'S3 public access block booleans must be true'
     description = 'Detect S3 PublicAccessBlockConfiguration keys set to False'
     tags = ['s3','security']
+    resource_types = ['AWS::S3::BucketPublicAccessBlock', 'AWS::S3::Bucket']
 
 
     def match(self, cfn):
@@ -58,6 +66,7 @@ class CustomS3BucketEncryptionRule(CloudFormationLintRule):
     shortdesc = 'S3 buckets should have server-side encryption'
     description = 'Checks that S3 BucketEncryption uses AES256 or aws:kms, if aws:kms is set, check that the keys has been initialized'
     tags = ['s3','encryption']
+    resource_types = ['AWS::S3::Bucket']
 
 
     def match(self, cfn):
@@ -91,6 +100,7 @@ class CustomIamWildcardActionRule(CloudFormationLintRule):
     shortdesc = 'IAM policies should not use wildcard action'
     description = 'Detects Action: * wildcard or similar in policies'
     tags = ['iam','security']
+    resource_types = ['AWS::IAM::Policy', 'AWS::IAM::Role', 'AWS::IAM::User', 'AWS::IAM::Group']
 
     def _check_policy_doc(self, policy_doc, base_path, matches, resname):
         stmts = policy_doc.get("Statement") or []
@@ -146,6 +156,7 @@ class CustomSecurityGroupOpenToWorldRule(CloudFormationLintRule):
     shortdesc = 'SecurityGroup opens SSH/RDP or all ports to 0.0.0.0/0'
     description = 'Detects SecurityGroup ingress/egress entries open to 0.0.0.0/0 on ports 22 or 3389 or all ports'
     tags = ['ec2','security']
+    resource_types = ['AWS::EC2::SecurityGroup']
 
     def _port_contains_danger(self, from_p, to_p):
         try:
@@ -198,6 +209,7 @@ class CustomRdsStorageEncryptedRule(CloudFormationLintRule):
     shortdesc = 'RDS StorageEncrypted must be true'
     description = 'Check DBInstance and DBCluster StorageEncrypted property'
     tags = ['rds','encryption']
+    resource_types = ['AWS::RDS::DBInstance', 'AWS::RDS::DBCluster']
 
     def match(self, cfn):
         matches = []
@@ -218,6 +230,7 @@ class CustomS3BucketVersioningRule(CloudFormationLintRule):
     shortdesc = 'S3 buckets should have versioning enabled'
     description = 'Check if an S3 bucket has versioning configured and enabled'
     tags = ['s3', 'operations']
+    resource_types = ['AWS::S3::Bucket']
 
     def match(self, cfn):
         matches = []
@@ -236,6 +249,7 @@ class CustomS3BucketAccessLoggingRule(CloudFormationLintRule):
     shortdesc = 'S3 buckets should have access logging enabled'
     description = 'Check if an S3 bucket has access logging enabled'
     tags = ['s3', 'security', 'operations']
+    resource_types = ['AWS::S3::Bucket']
 
     def match(self, cfn):
         matches = []
@@ -257,6 +271,7 @@ class CustomEC2InstanceNoPublicIpRule(CloudFormationLintRule):
     shortdesc = 'EC2 instances should not have public IPs'
     description = 'EC2 instances with a public IP assigned during launch'
     tags = ['ec2', 'security']
+    resource_types = ['AWS::EC2::Instance']
 
     def match(self, cfn):
         matches = []
@@ -278,6 +293,7 @@ class CustomLambdaVpcConfigRule(CloudFormationLintRule):
     shortdesc = 'Lambda functions should be in a VPC for sensitive workloads'
     description = 'Check if a Lambda function is not configured to run in a VPC'
     tags = ['lambda', 'security']
+    resource_types = ['AWS::Lambda::Function']
 
 
     def match(self, cfn):
@@ -300,6 +316,7 @@ class CustomRDSMultiAzRule(CloudFormationLintRule):
     shortdesc = 'RDS instances should use Multi-AZ for high availability'
     description = 'Check if an RDS DBInstance is not configured for Multi-AZ'
     tags = ['rds', 'availability', 'operations']
+    resource_types = ['AWS::RDS::DBInstance']
 
 
     def match(self, cfn):
@@ -323,6 +340,7 @@ class CustomCloudFrontHttpsOnlyRule(CloudFormationLintRule):
     shortdesc = 'CloudFront distributions should use HTTPS-only'
     description = 'Check if CloudFront distribution viewer protocol policy is not set to redirect to HTTPS'
     tags = ['cloudfront', 'security']
+    resource_types = ['AWS::CloudFront::Distribution']
 
 
     def match(self, cfn):
@@ -358,6 +376,7 @@ class CustomCloudWatchLogRetentionRule(CloudFormationLintRule):
     shortdesc = 'CloudWatch Log Group retention period should be set'
     description = 'Check if a CloudWatch Log Group has no retention period defined'
     tags = ['cloudwatch', 'operations', 'cost']
+    resource_types = ['AWS::Logs::LogGroup']
 
     def match(self, cfn):
         matches = []
@@ -380,6 +399,9 @@ class CustomVpcFlowLogsEnabledRule(CloudFormationLintRule):
     shortdesc = 'VPC Flow Logs should be enabled'
     description = 'Check if VPC Flow Logs are not enabled for a VPC'
     tags = ['ec2', 'vpc', 'security']
+    resource_types = ['AWS::EC2::VPC']
+    #the flow logs are read to report on the vpcs
+    related_types = ['AWS::EC2::FlowLog']
 
 
     def match(self, cfn):
@@ -408,6 +430,7 @@ class CustomLambdaEnvVarEncryptionRule(CloudFormationLintRule):
     shortdesc = 'Lambda environment variables should not contain secrets'
     description = 'Check if Lambda function environment variables are potentially sensitive'
     tags = ['lambda', 'security']
+    resource_types = ['AWS::Lambda::Function']
 
     def match(self, cfn):
         matches = []
@@ -442,6 +465,7 @@ class CustomEC2TaggingEnforcedRule(CloudFormationLintRule):
     shortdesc = 'EC2 instances should have a Name tag'
     description = 'Check if an EC2 instance is missing a Name tag'
     tags = ['ec2', 'cost', 'operations']
+    resource_types = ['AWS::EC2::Instance']
 
 
     def match(self, cfn):
@@ -462,6 +486,7 @@ class CustomEbsEncryptionEnabledRule(CloudFormationLintRule):
     shortdesc = 'EBS volumes must be encrypted'
     description = 'Checks if an EBS volume has encryption enabled'
     tags = ['ec2', 'ebs', 'encryption', 'security']
+    resource_types = ['AWS::EC2::Volume']
 
 
     def match(self, cfn):
@@ -480,6 +505,7 @@ class CustomECRImageScanningRule(CloudFormationLintRule):
     shortdesc = 'ECR repositories should have image scanning enabled'
     description = 'Check if an ECR repository is not configured for image scanning on push'
     tags = ['ecr', 'security']
+    resource_types = ['AWS::ECR::Repository']
 
 
     def match(self, cfn):
@@ -504,6 +530,7 @@ class CustomRdsDeletionProtectionRule(CloudFormationLintRule):
     shortdesc = 'RDS instances should have deletion protection enabled'
     description = 'Check if an RDS DBInstance is not configured with deletion protection'
     tags = ['rds', 'operations']
+    resource_types = ['AWS::RDS::DBInstance']
 
 
     def match(self, cfn):
@@ -527,6 +554,7 @@ class CustomIamUserNoInlinePolicies(CloudFormationLintRule):
     shortdesc = 'IAM users should not have inline policies'
     description = 'Use managed policies over inline policies for IAM users'
     tags = ['iam', 'security']
+    resource_types = ['AWS::IAM::User']
 
 
     def match(self, cfn):
@@ -547,6 +575,7 @@ class CustomSnsTopicPolicyEnforcedRule(CloudFormationLintRule):
     shortdesc = 'SNS topic policies should restrict access'
     description = 'Check for an SNS topic policy that is overly permissive'
     tags = ['sns', 'security']
+    resource_types = ['AWS::SNS::TopicPolicy']
 
 
     def _check_policy(self, policy_doc, base_path, matches, resname):
@@ -583,6 +612,7 @@ class CustomWafEnabledOnCloudFront(CloudFormationLintRule):
     shortdesc = 'CloudFront distributions should use a WAF WebACL'
     description = 'Control if a CloudFront distribution is not associated with a WebACLId'
     tags = ['cloudfront', 'security']
+    resource_types = ['AWS::CloudFront::Distribution']
 
 
     def match(self, cfn):
@@ -613,6 +643,7 @@ class CustomCloudTrailEncryptionRule(CloudFormationLintRule):
     shortdesc = 'CloudTrail logs should be encrypted with KMS'
     description = 'Check if a CloudTrail trail is configured with a KMS key ID for encryption'
     tags = ['cloudtrail', 'security', 'encryption']
+    resource_types = ['AWS::CloudTrail::Trail']
 
 
     def match(self, cfn):
@@ -636,6 +667,7 @@ class CustomSecretsManagerRotationRule(CloudFormationLintRule):
     shortdesc = 'Secrets Manager secrets should have rotation enabled'
     description = 'An AWS Secrets Manager secret is not configured for rotation'
     tags = ['secretsmanager', 'security']
+    resource_types = ['AWS::SecretsManager::Secret']
 
 
     def match(self, cfn):
@@ -658,6 +690,7 @@ class CustomS3PublicReadWriteACLRule(CloudFormationLintRule):
     shortdesc = 'S3 buckets should not have public read/write ACLs'
     description = 'Check S3 buckets with ACLs that allow public read or write access'
     tags = ['s3', 'security']
+    resource_types = ['AWS::S3::Bucket']
 
 
     def match(self, cfn):
@@ -682,6 +715,7 @@ class CustomApiGatewayCachingEnabledRule(CloudFormationLintRule):
     shortdesc = 'API Gateway stages should have caching enabled'
     description = 'Check if an API Gateway Stage is not configured with caching'
     tags = ['apigateway', 'cost', 'performance']
+    resource_types = ['AWS::ApiGateway::Stage']
 
     def match(self, cfn):
         matches = []
@@ -703,6 +737,7 @@ class CustomDynamoDbEncryptionRule(CloudFormationLintRule):
     shortdesc = 'DynamoDB tables should be encrypted'
     description = 'Check if a DynamoDB table has server-side encryption enabled'
     tags = ['dynamodb', 'security', 'encryption']
+    resource_types = ['AWS::DynamoDB::Table']
 
     def match(self, cfn):
         matches = []
@@ -725,6 +760,7 @@ class CustomIamPolicyAttachedToGroupRule(CloudFormationLintRule):
     shortdesc = 'IAM policies should be attached to groups, not users'
     description = 'Attaching IAM policies to groups instead of individual users'
     tags = ['iam', 'security']
+    resource_types = ['AWS::IAM::Policy']
 
     def match(self, cfn):
         matches = []
@@ -747,6 +783,7 @@ class CustomEc2SshFromAnywhereRule(CloudFormationLintRule):
     shortdesc = 'Security groups should not allow SSH from 0.0.0.0/0'
     description = 'Check security group ingress rules for port 22 open to the world'
     tags = ['ec2', 'security']
+    resource_types = ['AWS::EC2::SecurityGroup']
 
 
     def match(self, cfn):
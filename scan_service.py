@@ -0,0 +1,92 @@
+import metrics
+import profiling
+from lint_pool import default_regions
+from QuickScan import threat_check
+from DeepSearch import generate_deepsearch_result, lint_cloudformation_template
+from cache import result_cache, result_key, normalize_parsed_template, normalize_raw_template
+from result_store import result_store
+
+
+#result of an earlier run from the on disk store, copied to the memory cache
+def stored_result(cache_key):
+    if profiling.is_active():
+        return None
+
+    stored_json = result_store.get(cache_key)
+    if stored_json is not None:
+        metrics.cache_events_total.inc(event="store_hit")
+        result_cache.put(cache_key, stored_json)
+    elif result_store.enabled:
+        metrics.cache_events_total.inc(event="store_miss")
+
+    return stored_json
+
+
+#result of the key from the memory cache or the store, None when the scan has to run.
+#a profiled request always scans, so the profile shows the real work
+def cached_result(cache_key):
+    if profiling.is_active():
+        return None
+
+    cached_json = result_cache.get(cache_key)
+    if cached_json is None:
+        cached_json = stored_result(cache_key)
+    return cached_json
+
+
+#keep the reports of finished scans, [(key, json)], failed scans are never kept
+def keep_results(items):
+    items = list(items)
+    for cache_key, result_json in items:
+        result_cache.put(cache_key, result_json)
+    result_store.put_many(items)
+
+
+#the keys identify a result: the template, the options and the rules. main.py also uses
+#them as the ETag of the response, so a client that has the result gets a 304 without a scan
+def quickscan_key(user_data):
+    return result_key("quickscan", normalize_parsed_template(user_data))
+
+
+def deepsearch_key(raw_user_data, order_by=(), selection=None, regions=default_regions):
+    return result_key("deepsearch", normalize_raw_template(raw_user_data), ",".join(order_by), repr(selection),
+                      ",".join(regions))
+
+
+#quickscan of a parsed template, identical templates return the cached result
+def quickscan(user_data, cache_key=None):
+
+    with metrics.stage("quickscan", "cache_lookup"):
+        if cache_key is None:
+            cache_key = quickscan_key(user_data)
+        cached_json = cached_result(cache_key)
+    if cached_json is not None:
+        return cached_json
+
+    return_json = threat_check(user_data)
+
+    keep_results([(cache_key, return_json)])
+
+    return return_json
+
+
+#deepsearch of the raw template text, identical templates return the cached result
+def deepsearch(raw_user_data, order_by=(), selection=None, regions=default_regions, cache_key=None):
+
+    with metrics.stage("deepsearch", "cache_lookup"):
+        if cache_key is None:
+            cache_key = deepsearch_key(raw_user_data, order_by, selection, regions)
+        cached_json = cached_result(cache_key)
+    if cached_json is not None:
+        return cached_json
+
+    #every request works on its own copy of the template, so scans can run concurrently
+    scan_results = lint_cloudformation_template(raw_user_data, selection, regions)
+
+    return_json = generate_deepsearch_result(scan_results, raw_user_data, order_by)
+
+    #a failed lint returns an error dict, only real reports are cached
+    if isinstance(return_json, str):
+        keep_results([(cache_key, return_json)])
+
+    return return_json
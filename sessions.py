@@ -0,0 +1,226 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import config
+from custom_rule_engine import ResourceIndex
+from json_patch import apply_patch, operation_paths
+from QuickScan import custom_rule_findings, resource_findings, group_findings
+
+
+#${Name} or ${Name.Attribute} inside a Fn::Sub string, ${!Literal} is not a reference
+sub_variable = re.compile(r"\$\{([^!}][^}]*)\}")
+
+
+class SessionError(Exception):
+    pass
+
+
+#names of the resources or parameters a resource points to through Ref, Fn::GetAtt,
+#Fn::Sub and DependsOn
+def resource_references(resource):
+    references = set()
+    stack = [resource]
+
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        for key, value in node.items():
+            if key == "Ref" and isinstance(value, str):
+                references.add(value)
+            elif key == "Fn::GetAtt":
+                if isinstance(value, list) and value and isinstance(value[0], str):
+                    references.add(value[0])
+                elif isinstance(value, str):
+                    references.add(value.split(".")[0])
+            elif key == "Fn::Sub":
+                sub_string = value[0] if isinstance(value, list) and value else value
+                if isinstance(sub_string, str):
+                    references.update(name.split(".")[0] for name in sub_variable.findall(sub_string))
+            elif key == "DependsOn":
+                if isinstance(value, str):
+                    references.add(value)
+                elif isinstance(value, list):
+                    references.update(name for name in value if isinstance(name, str))
+
+            stack.append(value)
+
+    return references
+
+
+def _resources_key(template):
+    if not isinstance(template, dict):
+        raise SessionError("The template must be a json object")
+
+    for key in ("Resources", "Resource"):
+        if isinstance(template.get(key), dict):
+            return key
+
+    raise SessionError("The template has no Resources object")
+
+
+#a template kept on the server with the findings of every resource, patches only rescan
+#the resources they touch and the resources linked to them
+class ScanSession:
+
+    def __init__(self, template):
+        self.id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+        self.template = template
+        self.resources_key = _resources_key(template)
+
+        #name -> names it references, and the reverse map
+        self.references = {}
+        self.referenced_by = {}
+        #name -> (type, findings) as returned by QuickScan.resource_findings
+        self.findings = {}
+        #resources by type for the custom rules, updated by every patch
+        self.resource_index = None
+
+        self._rebuild()
+
+    def resources(self):
+        return self.template[self.resources_key]
+
+    def _rebuild(self):
+        self.references = {}
+        self.referenced_by = {}
+        self.findings = {}
+        self.resource_index = ResourceIndex(self.resources())
+
+        self._update_references(self.resources())
+        self._rescan(self.resources())
+
+    def _update_references(self, names):
+        resources = self.resources()
+
+        for name in names:
+            for target in self.references.pop(name, ()):
+                self.referenced_by.get(target, set()).discard(name)
+
+            if name in resources:
+                self.references[name] = resource_references(resources[name])
+                for target in self.references[name]:
+                    self.referenced_by.setdefault(target, set()).add(name)
+
+    #the resources plus the ones they reference and the ones referencing them, rules like the
+    #VPC flow log check look across these links
+    def _linked(self, names):
+        linked = set(names)
+        for name in names:
+            linked.update(self.references.get(name, ()))
+            linked.update(self.referenced_by.get(name, ()))
+        return linked
+
+    #the custom rules only see the rescanned resources and the ones linked to them, enough for
+    #the rules that look across resources (a VPC and the flow logs pointing to it)
+    def _rescan(self, names):
+        resources = self.resources()
+        existing = [name for name in names if isinstance(resources.get(name), dict)]
+
+        for name in names:
+            self.findings.pop(name, None)
+
+        scope = self.resource_index.subset(self._linked(existing))
+        scoped_resources = {name: resources[name] for name in scope.positions}
+        custom_findings = custom_rule_findings(scoped_resources, resource_names=existing, resource_index=scope)
+        for name in existing:
+            self.findings[name] = resource_findings(resources[name], custom_findings.get(name, {}))
+
+    #resources touched by the operations, None when the whole resources object is replaced
+    def _touched_resources(self, operations):
+        touched = set()
+        for operation in operations:
+            for tokens in operation_paths(operation):
+                if not tokens or (tokens[0] in ("Resources", "Resource") and len(tokens) == 1):
+                    return None
+                if tokens[0] == self.resources_key:
+                    touched.add(tokens[1])
+
+        return touched
+
+    #apply a JSON patch and rescan what it changed, returns the names of the rescanned resources
+    def apply(self, operations):
+        patched_template = apply_patch(self.template, operations)
+        resources_key = _resources_key(patched_template)
+
+        touched = None if resources_key != self.resources_key else self._touched_resources(operations)
+
+        if touched is None:
+            self.template = patched_template
+            self.resources_key = resources_key
+            self._rebuild()
+            return sorted(self.resources())
+
+        #links are taken before and after the patch, so removed references are rescanned too
+        affected = self._linked(touched)
+        self.template = patched_template
+        for name in touched:
+            self.resource_index.set(name, self.resources().get(name))
+        self._update_references(touched)
+        affected |= self._linked(touched)
+
+        #parameters and removed resources can be referenced but have no findings
+        affected = {name for name in affected if name in self.resources() or name in self.findings}
+        self._rescan(affected)
+
+        return sorted(affected)
+
+    #same {type: [findings]} report the quick scan returns
+    def report(self):
+        return group_findings(self.findings[name] for name in self.resources() if name in self.findings)
+
+
+class SessionStore:
+
+    def __init__(self, max_sessions, ttl_seconds):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        expired_before = time.monotonic() - self.ttl_seconds
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used < expired_before:
+                del self._sessions[session_id]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def create(self, template):
+        session = ScanSession(template)
+
+        with self._lock:
+            self._sessions[session.id] = session
+            self._prune()
+
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            self._prune()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+
+        return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+session_store = SessionStore(config.SESSIONS_MAX, config.SESSIONS_TTL_SECONDS)
@@ -1,11 +1,25 @@
 // tirith-iac-security-scanner/src/api/scan.ts
 
 import api from "./axiosInstance";
-import type { QuickScanResponse, DeepSearchResponse } from "../types/scan";
+import type {
+  QuickScanResponse,
+  DeepSearchResponse,
+  DeepStreamFinding,
+  DeepStreamRecord,
+  DeepStreamSummary,
+} from "../types/scan";
 
-// Call /api/quickscan
-export async function quickScan(data: object): Promise<QuickScanResponse> {
-  const res = await api.post<QuickScanResponse>("/api/quickscan", data);
+// Call /api/quickscan, YAML templates are sent as text
+export async function quickScan(
+  data: object | string
+): Promise<QuickScanResponse> {
+  const res = await api.post<QuickScanResponse>(
+    "/api/quickscan",
+    data,
+    typeof data === "string"
+      ? { headers: { "Content-Type": "application/x-yaml" } }
+      : undefined
+  );
   return res.data;
 }
 
@@ -18,3 +32,70 @@ export async function deepSearch(data: string): Promise<DeepSearchResponse> {
   });
   return res.data;
 }
+
+// Call /api/deepsearch in streaming mode, onFindings runs once per chunk read with the
+// findings of its complete lines, so the caller updates its state once per chunk
+export async function deepSearchStream(
+  data: string,
+  isYaml: boolean,
+  onFindings: (findings: DeepStreamFinding[]) => void
+): Promise<DeepStreamSummary> {
+  // axios buffers the whole body in the browser, fetch lets us read it line by line
+  const res = await fetch(`${api.defaults.baseURL ?? ""}/api/deepsearch?stream=1`, {
+    method: "POST",
+    headers: {
+      "Content-Type": isYaml ? "application/x-yaml" : "application/json",
+      Accept: "application/x-ndjson",
+    },
+    body: data,
+  });
+  if (!res.ok || !res.body) {
+    // rejected templates come back with a json error (an ndjson error record in stream mode)
+    const body = await res.text().catch(() => "");
+    let message = `Deep search failed with status ${res.status}`;
+    try {
+      message = (JSON.parse(body) as { error?: string }).error ?? message;
+    } catch {
+      // not json, keep the status message
+    }
+    throw new Error(message);
+  }
+
+  let summary: DeepStreamSummary | null = null;
+  let findings: DeepStreamFinding[] = [];
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line) as DeepStreamRecord;
+    if (record.type === "finding") findings.push(record);
+    else if (record.type === "summary") summary = record;
+    else throw new Error(record.error);
+  };
+  const flush = () => {
+    if (findings.length === 0) return;
+    onFindings(findings);
+    findings = [];
+  };
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      handleLine(buffer.slice(0, newline));
+      buffer = buffer.slice(newline + 1);
+      newline = buffer.indexOf("\n");
+    }
+    flush();
+  }
+  handleLine(buffer);
+  flush();
+
+  if (summary === null) {
+    throw new Error("Deep search stream ended without a summary");
+  }
+  return summary;
+}
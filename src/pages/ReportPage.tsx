@@ -4,9 +4,8 @@ import { Link } from "react-router-dom";
 import type {
   QuickScanResponse,
   DeepSearchResponse,
-  DeepFinding,
 } from "../types/scan";
-import { quickScan, deepSearch } from "../api/scan";
+import { quickScan, deepSearchStream } from "../api/scan";
 import "../App.css";
 
 // for our syntax highligher in the context
@@ -29,6 +28,17 @@ type ProcessedDeepResult = {
 
 type ProcessedResult = ProcessedQuickResult | ProcessedDeepResult;
 
+// CloudFormation templates can be uploaded as JSON or YAML
+const isYamlFile = (file: File) =>
+  /\.ya?ml$/i.test(file.name) ||
+  file.type === "application/x-yaml" ||
+  file.type === "text/yaml";
+
+const isTemplateFile = (file: File) =>
+  file.type === "application/json" ||
+  /\.json$/i.test(file.name) ||
+  isYamlFile(file);
+
 // Define the Header component LandingPage-like
 const HeaderComponent = () => (
   <header className="bg-[#2d110f] p-4 font-rajdhani">
@@ -314,7 +324,9 @@ function ReportPage() {
           setError("Failed to read file content.");
           return;
         }
-        const jsonData = JSON.parse(fileContent);
+        // YAML templates are sent as text, the backend parses them
+        const isYaml = isYamlFile(file);
+        const jsonData = isYaml ? null : JSON.parse(fileContent);
 
         setFileContentString(fileContent);
 
@@ -323,6 +335,7 @@ function ReportPage() {
         setTotalIssues(0);
         setSummaryMessage("");
         setProcessedResults([]);
+        setIssueLines({});
         setAnalysisStatus(
           `Running ${scanType === "quick" ? "Quick Scan" : "Deep Search"}...`
         );
@@ -331,7 +344,7 @@ function ReportPage() {
         let rulesCount = 0;
         if (scanType === "quick") {
           console.log("Making a quick scan API call with POST method...");
-          result = await quickScan(jsonData);
+          result = await quickScan(isYaml ? fileContent : jsonData);
           Object.values(result).forEach((resourceFindings) => {
             resourceFindings.forEach((finding) => {
               rulesCount += Object.keys(finding).length;
@@ -353,52 +366,61 @@ function ReportPage() {
           }
           setProcessedResults(processed);
         } else {
-          console.log("Making a deep scan API call with POST method...");
-          result = await deepSearch(fileContent);
+          console.log("Making a deep scan API call in streaming mode...");
           if (jsonData && jsonData.Resources) {
             rulesCount = Object.keys(jsonData.Resources).length;
           }
-          setScanResult(result);
-          const processed: ProcessedDeepResult[] = [];
-          const deepScanResult = result as DeepSearchResponse;
-
-          if (deepScanResult && deepScanResult.Resources) {
-            for (const [rule, findings] of Object.entries(
-              deepScanResult.Resources
-            )) {
-              if (Array.isArray(findings)) {
-                findings.forEach((finding: DeepFinding) => {
-                  let line = "N/A";
-                  if (finding.path && finding.path !== "not found") {
-                    line = finding.path.replace(":", " | ");
-                  }
-                  processed.push({
-                    rule: rule,
-                    description: finding.message,
-                    line: line,
-                    recommendation: finding.rule_solution,
-                    severity: finding.severity,
-                  });
-                });
-              }
-            }
-          }
-          setProcessedResults(processed);
+          const deepScanResult: DeepSearchResponse = { Resources: {} };
+
+          // findings are rendered as soon as each chunk of the stream arrives, with one
+          // state update per chunk instead of one per finding
+          await deepSearchStream(fileContent, isYaml, (findings) => {
+            const processedBatch: ProcessedDeepResult[] = [];
+            const batchIssueLines: Record<number, string> = {};
 
-          const lineSeverityMap: Record<number, string> = {};
-          if (scanType === "deep") {
-            const deepScanResults = processed.filter(
-              (r): r is ProcessedDeepResult => "line" in r && r.line !== "N/A"
-            );
+            for (const finding of findings) {
+              if (finding.resource !== "Resources") continue;
 
-            for (const result of deepScanResults) {
-              const lineNumber = parseInt(result.line.split(" | ")[0], 10);
-              if (!isNaN(lineNumber)) {
-                lineSeverityMap[lineNumber] = result.severity || "Unclassified";
+              const { property, severity, message, path, rule_solution } = finding;
+              if (!deepScanResult.Resources[property]) {
+                deepScanResult.Resources[property] = [];
+              }
+              deepScanResult.Resources[property].push({
+                severity,
+                message,
+                path,
+                rule_solution,
+              });
+
+              let line = "N/A";
+              if (path && path !== "not found") {
+                line = path.replace(":", " | ");
+              }
+              processedBatch.push({
+                rule: property,
+                description: message,
+                line: line,
+                recommendation: rule_solution,
+                severity: severity,
+              });
+
+              if (line !== "N/A") {
+                const lineNumber = parseInt(line.split(" | ")[0], 10);
+                if (!isNaN(lineNumber)) {
+                  batchIssueLines[lineNumber] = severity || "Unclassified";
+                }
               }
             }
-          }
-          setIssueLines(lineSeverityMap);
+
+            if (processedBatch.length > 0) {
+              setProcessedResults((previous) => [...previous, ...processedBatch]);
+            }
+            if (Object.keys(batchIssueLines).length > 0) {
+              setIssueLines((previous) => ({ ...previous, ...batchIssueLines }));
+            }
+          });
+          result = deepScanResult;
+          setScanResult(result);
         }
         setTotalRules(rulesCount);
         const issuesCount = countTotalIssues(result, scanType);
@@ -425,11 +447,11 @@ function ReportPage() {
   };
 
   const handleFileSelected = (file: File | null) => {
-    if (file && file.type === "application/json") {
+    if (file && isTemplateFile(file)) {
       setUploadedFile(file);
       handleFileAnalysis(file);
     } else {
-      alert("Please select a valid JSON file.");
+      alert("Please select a valid JSON or YAML file.");
     }
   };
 
@@ -536,7 +558,7 @@ function ReportPage() {
               type="file"
               ref={fileInputRef}
               onChange={handleFileChange}
-              accept="application/json"
+              accept="application/json,.json,.yaml,.yml,application/x-yaml"
               className="hidden"
             />
             <JaggedBoxComponent
@@ -753,7 +775,7 @@ function ReportPage() {
           <SectionContainerComponent title="Context" className="scroll-mt-24">
             <div className="relative">
               <SyntaxHighlighter
-                language="json"
+                language={uploadedFile && isYamlFile(uploadedFile) ? "yaml" : "json"}
                 style={synthwave84}
                 showLineNumbers
                 wrapLines={true}
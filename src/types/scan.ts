@@ -12,3 +12,26 @@ export interface DeepFinding {
 export interface DeepSearchResponse {
   Resources: Record<string, DeepFinding[]>;
 }
+
+// DeepSearch streaming records (/api/deepsearch?stream=1, one JSON object per line)
+export interface DeepStreamFinding extends DeepFinding {
+  type: "finding";
+  resource: string;
+  property: string;
+}
+
+export interface DeepStreamSummary {
+  type: "summary";
+  total: number;
+  severity: Record<"High" | "Medium" | "Low" | "Unclassified", number>;
+}
+
+export interface DeepStreamError {
+  type: "error";
+  error: string;
+}
+
+export type DeepStreamRecord =
+  | DeepStreamFinding
+  | DeepStreamSummary
+  | DeepStreamError;
@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from pathlib import Path
+
+from flask import Response, request
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+#the built frontend (dist/) held in memory: every file is read once, by the server entry
+#points or on the first request, with its precompressed variants, so serving an asset never
+#touches the filesystem. the lint workers import main.py too and never load them.
+#the hashed files listed in the vite manifest (or under assets/ when the build has no
+#manifest) never change and are cached for a year, the rest (index.html) is revalidated
+
+manifest_path = ".vite/manifest.json"
+hashed_directory = "assets/"
+
+immutable_cache_control = "public, max-age=31536000, immutable"
+revalidate_cache_control = "no-cache"
+
+#the precompressed variants written next to the files by the build, e.g. app.js.br
+variant_suffixes = {"br": ".br", "gzip": ".gz"}
+
+compressible_types = ("text/", "application/javascript", "application/json", "application/manifest+json",
+                      "image/svg+xml", "application/xml", "application/wasm")
+
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("text/javascript", ".mjs")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("application/wasm", ".wasm")
+
+
+class Asset:
+
+    def __init__(self, body, mimetype, immutable):
+        self.body = body
+        self.mimetype = mimetype
+        self.cache_control = immutable_cache_control if immutable else revalidate_cache_control
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        #encoding -> compressed body
+        self.variants = {}
+
+
+def _hashed_files(directory):
+    try:
+        manifest = json.loads((directory / manifest_path).read_text())
+    except (OSError, ValueError):
+        return None
+
+    hashed = set()
+    for chunk in manifest.values():
+        hashed.add(chunk.get("file"))
+        hashed.update(chunk.get("css", []))
+        hashed.update(chunk.get("assets", []))
+
+    return hashed
+
+
+#the variants of the build are kept, the missing ones are compressed here once
+def _add_variants(asset, file_path):
+    for encoding, suffix in variant_suffixes.items():
+        variant_path = file_path.with_name(file_path.name + suffix)
+        if variant_path.is_file():
+            asset.variants[encoding] = variant_path.read_bytes()
+
+    if not asset.mimetype.startswith(compressible_types) or len(asset.body) < config.RESPONSE_COMPRESS_MIN_BYTES:
+        return
+
+    if "gzip" not in asset.variants:
+        asset.variants["gzip"] = gzip.compress(asset.body, compresslevel=9, mtime=0)
+    if "br" not in asset.variants and brotli is not None:
+        asset.variants["br"] = brotli.compress(asset.body, quality=11)
+
+    #a variant that saves nothing is not worth the Content-Encoding
+    for encoding, body in list(asset.variants.items()):
+        if len(body) >= len(asset.body):
+            del asset.variants[encoding]
+
+
+def load_assets(static_folder):
+    directory = Path(static_folder)
+    if not directory.is_dir():
+        print(f"The frontend is not built ({directory} is missing), run npm run build")
+        return {}
+
+    hashed = _hashed_files(directory)
+
+    assets = {}
+    for root, directories, files in os.walk(directory):
+        #the manifest and other dot directories are build metadata, not assets
+        directories[:] = [name for name in directories if not name.startswith(".")]
+        for name in files:
+            if name.endswith(tuple(variant_suffixes.values())) and name.rsplit(".", 1)[0] in files:
+                continue
+
+            file_path = Path(root) / name
+            asset_path = file_path.relative_to(directory).as_posix()
+            immutable = asset_path in hashed if hashed is not None else asset_path.startswith(hashed_directory)
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+            try:
+                asset = Asset(file_path.read_bytes(), mimetype, immutable)
+                _add_variants(asset, file_path)
+            except OSError as e:
+                print(f"Error loading the asset {asset_path}: {e}")
+                continue
+
+            assets[asset_path] = asset
+
+    return assets
+
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+#the assets of static_folder, loaded on the first call
+def frontend_assets(static_folder):
+    global _assets
+
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                _assets = load_assets(static_folder)
+
+    return _assets
+
+
+def _encoding(asset):
+    if not asset.variants:
+        return None
+    return request.accept_encodings.best_match([encoding for encoding in ("br", "gzip") if encoding in asset.variants])
+
+
+def asset_response(asset):
+    headers = {"Cache-Control": asset.cache_control}
+    if asset.variants:
+        headers["Vary"] = "Accept-Encoding"
+
+    #weak, the compressed and identity bodies share the ETag
+    if request.if_none_match.contains_weak(asset.etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(asset.etag, weak=True)
+        return response
+
+    encoding = _encoding(asset)
+    body = asset.variants[encoding] if encoding else asset.body
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    response = Response(body, mimetype=asset.mimetype, headers=headers)
+    response.set_etag(asset.etag, weak=True)
+    return response
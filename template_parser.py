@@ -0,0 +1,132 @@
+import json
+
+import yaml
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+from utilities import LineIndex
+
+#libyaml scanner, parser and composer when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as TemplateLoader
+except ImportError:
+    from yaml import SafeLoader as TemplateLoader
+
+
+#short form intrinsic functions of the yaml templates, !Ref Name is {"Ref": "Name"}
+intrinsic_functions = {
+    "!Ref": "Ref",
+    "!Condition": "Condition",
+    "!GetAtt": "Fn::GetAtt",
+}
+for function_name in ("And", "Base64", "Cidr", "Equals", "FindInMap", "ForEach", "GetAZs", "If",
+                      "ImportValue", "Join", "Length", "Not", "Or", "Select", "Split", "Sub",
+                      "ToJsonString", "Transform"):
+    intrinsic_functions[f"!{function_name}"] = f"Fn::{function_name}"
+
+#scalars kept as text instead of being turned into python objects
+text_scalar_tags = {"tag:yaml.org,2002:timestamp", "tag:yaml.org,2002:binary"}
+
+
+class TemplateParseError(Exception):
+    pass
+
+
+#valid json or yaml that is not a cloudformation template
+class NotATemplateError(TemplateParseError):
+    pass
+
+
+def is_json_text(text):
+    stripped = text.lstrip()
+    return stripped.startswith("{") or stripped.startswith("[")
+
+
+def _pointer_token(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+#builds the python value of the composed node tree and the position of every value in one walk
+class _MarkedBuilder:
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.positions = {}
+
+    def build(self, node, pointer):
+        self.positions[pointer] = (node.start_mark.line, node.start_mark.column)
+
+        function = intrinsic_functions.get(node.tag)
+        if function is not None:
+            inner_pointer = f"{pointer}/{_pointer_token(function)}"
+            self.positions[inner_pointer] = self.positions[pointer]
+
+            if function == "Fn::GetAtt" and isinstance(node, ScalarNode):
+                value = node.value.split(".", 1)
+            else:
+                value = self._build_untagged(node, inner_pointer)
+            return {function: value}
+
+        return self._build_untagged(node, pointer)
+
+    def _build_untagged(self, node, pointer):
+        if isinstance(node, MappingNode):
+            mapping = {}
+            for key_node, value_node in node.value:
+                #template keys are plain scalars, they have no position of their own in the index
+                key = self.loader.construct_object(key_node, deep=True)
+                mapping[key] = self.build(value_node, f"{pointer}/{_pointer_token(key)}")
+            return mapping
+
+        if isinstance(node, SequenceNode):
+            return [self.build(item, f"{pointer}/{i}") for i, item in enumerate(node.value)]
+
+        if node.tag in text_scalar_tags or node.tag.startswith("!"):
+            return node.value
+        return self.loader.construct_object(node, deep=True)
+
+
+#parse a yaml template, returns the data and the LineIndex taken from the node start marks
+def load_yaml_template(text):
+    loader = TemplateLoader(text)
+    try:
+        node = loader.get_single_node()
+        if node is None:
+            return None, LineIndex({})
+
+        builder = _MarkedBuilder(loader)
+        data = builder.build(node, "")
+        return data, LineIndex(builder.positions)
+    except yaml.YAMLError as e:
+        raise TemplateParseError(f"Invalid yaml template: {e}")
+    finally:
+        loader.dispose()
+
+
+#parsed template from json or yaml text, a template is always a mapping with a Resources
+#(or Resource) mapping
+def parse_template(text):
+    if is_json_text(text):
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise TemplateParseError(f"Invalid json template: {e}")
+    else:
+        data, _ = load_yaml_template(text)
+
+    if not isinstance(data, dict):
+        raise NotATemplateError("The template must be a json or yaml mapping")
+    if not isinstance(data.get("Resources", data.get("Resource")), dict):
+        raise NotATemplateError("The template has no Resources mapping")
+    return data
+
+
+#json templates are mapped with json_source_map, yaml ones with the marks of the parse
+def build_line_index(text):
+    if is_json_text(text):
+        return LineIndex.from_text(text)
+
+    try:
+        _, line_index = load_yaml_template(text)
+    except TemplateParseError:
+        return LineIndex({})
+    return line_index
@@ -0,0 +1,131 @@
+import codecs
+import json
+
+
+#keys of the top level object whose entries are the resources
+resources_keys = ("Resources", "Resource")
+
+json_whitespace = " \t\n\r"
+
+#characters that can continue a number cut by the end of the buffer, e.g. "1." or "2e"
+number_characters = frozenset("0123456789.eE+-")
+
+#a decode error this close to the end of the buffer may be a value cut by the chunk ("tru",
+#"-Infinit", a \uXXXX escape), more text can complete it. further away it never can, except
+#an unterminated string, which runs to the end of the buffer
+incomplete_margin = 16
+
+
+class TemplateStreamError(Exception):
+    pass
+
+
+#incremental reader of a json template from a binary stream, only the value being decoded
+#and the unread part of the last chunk are kept in memory
+class JsonStreamReader:
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    #drop what was already consumed and append at least size more characters
+    def _fill(self, size=None):
+        if self.eof:
+            return False
+
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+
+        wanted = max(size or 0, self.chunk_size)
+        read = 0
+        while read < wanted:
+            chunk = self.stream.read(wanted - read)
+            if not chunk:
+                self.buffer += self.text_decoder.decode(b"", final=True)
+                self.eof = True
+                break
+            read += len(chunk)
+            self.buffer += self.text_decoder.decode(chunk)
+
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in json_whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, *chars):
+        char = self.peek()
+        if char not in chars:
+            raise TemplateStreamError(f"Expected {' or '.join(chars)} but found {char or 'the end of the template'}")
+        self.pos += 1
+        return char
+
+    def _cut_number(self, value, end):
+        return (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and number_characters.issuperset(self.buffer[end:]))
+
+    def _incomplete(self, error):
+        if error.msg.startswith("Unterminated string"):
+            return True
+        return len(self.buffer[error.pos:].rstrip(json_whitespace)) <= incomplete_margin
+
+    #decode the next complete value, the buffer grows geometrically while the value is incomplete.
+    #invalid json fails as soon as it is read, not at the end of the body
+    def read_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if self.eof or not self._cut_number(value, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof or not self._incomplete(e):
+                    raise TemplateStreamError(f"Invalid json template: {e}")
+
+            self._fill(len(self.buffer) - self.pos)
+
+
+#yield (name, resource) for each entry of the Resources object as soon as it is decoded,
+#the other top level values are decoded and dropped
+def iter_resources(stream, chunk_size=64 * 1024):
+    reader = JsonStreamReader(stream, chunk_size)
+
+    if reader.peek() != "{":
+        raise TemplateStreamError("Streaming mode needs a json object template")
+    reader.expect("{")
+
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.read_value()
+        reader.expect(":")
+
+        if key in resources_keys and reader.peek() == "{":
+            reader.expect("{")
+            if reader.peek() != "}":
+                while True:
+                    name = reader.read_value()
+                    reader.expect(":")
+                    yield name, reader.read_value()
+                    if reader.expect(",", "}") == "}":
+                        break
+            else:
+                reader.expect("}")
+        else:
+            reader.read_value()
+
+        if reader.expect(",", "}") == "}":
+            return
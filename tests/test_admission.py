@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import admission
+from admission import AdmissionLimiter, OverloadedError
+
+
+def test_queue_full_is_rejected_right_away():
+    limiter = AdmissionLimiter("test", 1, 0, 5)
+    limiter.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(OverloadedError):
+        limiter.acquire()
+    assert time.monotonic() - start < 1
+
+
+def test_waiting_request_times_out():
+    limiter = AdmissionLimiter("test", 1, 1, 0.05)
+    limiter.acquire()
+
+    with pytest.raises(OverloadedError, match="Timed out"):
+        limiter.acquire()
+    assert limiter.waiting == 0
+
+
+def test_waiting_request_gets_the_released_slot():
+    limiter = AdmissionLimiter("test", 1, 1, 5)
+    limiter.acquire()
+
+    threading.Timer(0.05, limiter.release).start()
+    limiter.acquire()
+    assert limiter.active == 1
+
+
+#a background job waits for its slot without a timeout and leaves the waiting room to requests
+def test_background_acquire_waits_past_the_timeout():
+    limiter = AdmissionLimiter("test", 1, 0, 0.01)
+    limiter.acquire()
+
+    acquired = threading.Event()
+
+    def job():
+        limiter.acquire(background=True)
+        acquired.set()
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    time.sleep(0.1)
+    assert not acquired.is_set()
+    assert limiter.waiting == 0
+
+    limiter.release()
+    thread.join(5)
+    assert acquired.is_set()
+    assert limiter.active == 1
+
+
+def test_admitted_returns_503():
+    limiter = AdmissionLimiter("test", 1, 0, 5)
+    app = Flask(__name__)
+
+    @app.route("/scan")
+    @admission.admitted(limiter)
+    def scan():
+        return {"ok": True}
+
+    client = app.test_client()
+    assert client.get("/scan").status_code == 200
+    assert limiter.active == 0
+
+    limiter.acquire()
+    response = client.get("/scan")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.config.ADMISSION_RETRY_AFTER_SECONDS)
+    assert "retry later" in response.get_json()["error"]
+
+
+#a running job holds a slot of the endpoint of its mode
+def test_job_holds_a_slot(monkeypatch):
+    import jobs
+
+    active_during_scan = []
+
+    def quickscan(user_data):
+        active_during_scan.append(admission.quickscan_limiter.active)
+        return "{}"
+
+    monkeypatch.setattr(jobs.scan_service, "quickscan", quickscan)
+    active = admission.quickscan_limiter.active
+
+    assert jobs.run_job(jobs.Job("quickscan", '{"Resources": {}}')) == "{}"
+    assert active_during_scan == [active + 1]
+    assert admission.quickscan_limiter.active == active
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "LINT_POOL_SIZE", 0)
+
+    import main
+    monkeypatch.setattr(main.scan_service.result_store, "enabled", False)
+    return main.app.test_client()
+
+
+duplicate_keys = '{"Resources": {"Bucket": {"Type": "AWS::S3::Bucket"}, "Bucket": {"Type": "AWS::S3::Bucket"}}}'
+
+
+#templates the client got wrong are rejected with a 400 and the reason
+
+def test_quickscan_without_resources(client):
+    response = client.post("/api/quickscan", data='{"Parameters": {}}', content_type="application/json")
+
+    assert response.status_code == 400
+    assert "Resources" in response.get_json()["error"]
+
+
+def test_deepsearch_decode_error(client):
+    response = client.post("/api/deepsearch", data=duplicate_keys, content_type="application/json")
+
+    assert response.status_code == 400
+    assert "Bucket" in response.get_json()["error"]
+
+
+def test_deepsearch_not_a_mapping(client):
+    response = client.post("/api/deepsearch", data="[1, 2]", content_type="application/json")
+
+    assert response.status_code == 400
+    assert "mapping" in response.get_json()["error"]
+
+
+def test_deepsearch_stream_decode_error(client):
+    response = client.post("/api/deepsearch?stream=1", data=duplicate_keys, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.mimetype == "application/x-ndjson"
+    record = json.loads(response.get_data(as_text=True))
+    assert record["type"] == "error"
+    assert "Bucket" in record["error"]
+
+
+#opening a session scans the template, it waits for a quick scan slot
+def test_create_session_is_admitted(client, monkeypatch):
+    import admission
+    limiter = admission.quickscan_limiter
+    monkeypatch.setattr(limiter, "max_waiting", 0)
+    monkeypatch.setattr(limiter, "active", limiter.max_active)
+
+    response = client.post("/api/sessions", data='{"Resources": {}}', content_type="application/json")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
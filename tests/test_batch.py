@@ -0,0 +1,85 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+import batch
+import config
+import scan_service
+from batch import BatchError, run_batch, templates_from_archive, templates_from_json
+from cache import result_cache
+
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setattr(config, "LINT_POOL_SIZE", 0)
+    monkeypatch.setattr(scan_service.result_store, "enabled", False)
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
+
+bucket = {"Resources": {"Bucket": {"Type": "AWS::S3::Bucket", "Properties": {"AccessControl": "PublicRead"}}}}
+
+
+#two templates with the same name would silently replace each other
+
+@pytest.mark.parametrize("body", [
+    '{"a.json": {"Resources": {}}, "a.json": {"Resources": {}}}',
+    '[{"name": "a", "template": "{}"}, {"name": "a", "template": "{}"}]',
+    #an unnamed entry is named after its index
+    '[{"name": "1", "template": "{}"}, {"template": "{}"}]',
+])
+def test_duplicate_names_in_json(body):
+    with pytest.raises(BatchError):
+        templates_from_json(body)
+
+
+def test_duplicate_keys_inside_a_template_are_kept_for_the_scan():
+    templates = templates_from_json('{"a.json": {"Resources": {"A": 1, "A": 2}}, "b.json": {"Resources": {}}}')
+    assert list(templates) == ["a.json", "b.json"]
+
+
+def test_duplicate_archive_members():
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("stack.json", "{}")
+        with pytest.warns(UserWarning):
+            zip_file.writestr("stack.json", "{}")
+
+    with pytest.raises(BatchError):
+        templates_from_archive(archive.getvalue())
+
+
+#the batch shares the results of the single template endpoints
+
+def test_batch_uses_the_scan_service_cache(monkeypatch):
+    scanned = []
+    scan_template = batch.scan_template
+
+    def counting_scan(raw_template, parsed_template, modes):
+        scanned.append(tuple(modes))
+        return scan_template(raw_template, parsed_template, modes)
+
+    monkeypatch.setattr(batch, "scan_template", counting_scan)
+    raw_template = json.dumps(bucket)
+
+    #a template the quick scan endpoint already scanned only needs its deep search
+    scan_service.quickscan(bucket)
+    first = json.loads(run_batch({"a.json": raw_template}))
+    assert scanned == [("deepsearch",)]
+
+    #every result of the second batch comes from the cache
+    second = json.loads(run_batch({"b.json": raw_template}))
+    assert scanned == [("deepsearch",)]
+    assert second["b.json"] == first["a.json"]
+    assert list(second["b.json"]) == ["quickscan", "deepsearch"]
+    assert second["b.json"]["quickscan"] == json.loads(scan_service.quickscan(bucket))
+
+
+def test_failed_scans_are_not_cached():
+    first = json.loads(run_batch({"a.json": "[1]"}))
+    assert "error" in first["a.json"]["quickscan"]
+
+    assert result_cache.get(scan_service.deepsearch_key("[1]")) is None
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import config
+import lint_pool
+from custom_rule_engine import (
+    ResourceIndex, TemplateShim, loaded_custom_rules, reads_one_resource, rule_applies, rule_read_types,
+    run_custom_rules,
+)
+
+
+resources = {
+    "Bucket": {"Type": "AWS::S3::Bucket", "Properties": {"AccessControl": "PublicRead"}},
+    "Group": {"Type": "AWS::EC2::SecurityGroup", "Properties": {
+        "GroupDescription": "ssh",
+        "SecurityGroupIngress": [{"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "CidrIp": "0.0.0.0/0"}],
+    }},
+    "Logs": {"Type": "AWS::S3::Bucket"},
+    "Vpc": {"Type": "AWS::EC2::VPC", "Properties": {"CidrBlock": "10.0.0.0/16"}},
+    "Count": 42,
+}
+
+
+def rule(rule_id):
+    return next(rule for rule in loaded_custom_rules if rule.id == rule_id)
+
+
+def test_resource_index_keeps_the_template_order():
+    index = ResourceIndex(resources)
+
+    assert list(index.get(["AWS::S3::Bucket"])) == ["Bucket", "Logs"]
+    assert list(index.get(["AWS::EC2::VPC", "AWS::S3::Bucket"])) == ["Bucket", "Logs", "Vpc"]
+    #resources without a type are not indexed
+    assert list(index.all()) == ["Bucket", "Group", "Logs", "Vpc"]
+    assert list(index.subset(["Vpc", "Bucket", "Missing"]).all()) == ["Bucket", "Vpc"]
+
+
+def test_resource_index_set_and_remove():
+    index = ResourceIndex(resources)
+
+    index.set("Bucket", {"Type": "AWS::EC2::VPC"})
+    index.set("New", {"Type": "AWS::S3::Bucket"})
+    index.remove("Logs")
+
+    #a changed resource keeps its position, a new one goes last
+    assert list(index.get(["AWS::EC2::VPC"])) == ["Bucket", "Vpc"]
+    assert list(index.all()) == ["Bucket", "Group", "Vpc", "New"]
+    assert index.has_any(["AWS::EC2::SecurityGroup"])
+
+    index.remove("Group")
+    assert not index.has_any(["AWS::EC2::SecurityGroup"])
+
+
+def test_shim_get_resources():
+    cfn = TemplateShim({"Resources": resources})
+
+    assert list(cfn.get_resources("AWS::S3::Bucket")) == ["Bucket", "Logs"]
+    assert list(cfn.get_resources()) == ["Bucket", "Group", "Logs", "Vpc"]
+    assert TemplateShim({"Resources": [1]}).get_resources() == {}
+
+
+def test_rule_declarations():
+    index = ResourceIndex(resources)
+
+    assert rule_applies(rule("W13"), index)
+    assert not rule_applies(rule("W13"), ResourceIndex({"Bucket": resources["Bucket"]}))
+
+    #the vpc rule looks up the flow logs of the vpcs, it must see the whole template
+    assert rule_read_types(rule("W13")) == {"AWS::EC2::VPC", "AWS::EC2::FlowLog"}
+    assert not reads_one_resource(rule("W13"))
+    assert reads_one_resource(rule("E01"))
+
+
+def test_resource_names_scope_the_matches():
+    template = {"Resources": resources}
+    every_match = run_custom_rules(template)
+    bucket_matches = run_custom_rules(template, resource_names=["Bucket"])
+
+    assert bucket_matches
+    assert all(match.path[1] == "Bucket" for _, match in bucket_matches)
+    assert [(rule.id, match.path) for rule, match in bucket_matches] == [
+        (rule.id, match.path) for rule, match in every_match if match.path[1] == "Bucket"
+    ]
+
+
+def test_failing_rule_is_skipped(capsys):
+    class Broken:
+        id = "X01"
+
+        def match(self, cfn):
+            raise ValueError("broken")
+
+    assert run_custom_rules({"Resources": resources}, rules=[Broken(), rule("W13")])
+    assert "X01" in capsys.readouterr().out
+
+
+#the quick scan runs the custom rules without cfn-lint, it must find what cfn-lint finds
+@pytest.mark.parametrize("path", [
+    "template_discrete.json",
+    "public/cloud_formation_test_templates/cloudFormation_template.json",
+    "public/cloud_formation_test_templates/cloudFormation_template_2.json",
+])
+def test_same_matches_as_cfn_lint(path, monkeypatch):
+    monkeypatch.setattr(config, "LINT_POOL_SIZE", 0)
+    with open(path) as f:
+        text = f.read()
+
+    native = {(rule.id, tuple(match.path)) for rule, match in run_custom_rules(json.loads(text))}
+    selection = lint_pool.rule_selection(rules=[rule.id for rule in loaded_custom_rules])
+    linted = {(match.rule.id, tuple(match.path)) for match in lint_pool.lint(text, selection=selection)}
+
+    assert native == linted
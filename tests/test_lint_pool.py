@@ -0,0 +1,125 @@
+import json
+import threading
+
+import pytest
+
+import config
+import lint_pool
+
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setattr(config, "LINT_POOL_SIZE", 0)
+
+
+template = json.dumps({
+    "Parameters": {"Unused": {"Type": "String"}},
+    "Resources": {"Bucket": {"Type": "AWS::S3::Bucket", "Properties": {"Unknown": "value"}}},
+})
+
+regions = ("us-east-1", "eu-west-1")
+
+
+def matches_of(matches, rule_id):
+    return [match for match in matches if match.rule.id == rule_id]
+
+
+#multi-region lints
+
+def test_lint_regions_decodes_once(monkeypatch):
+    calls = []
+    decode_str = lint_pool.decode_str
+
+    def counting_decode(text):
+        calls.append(text)
+        return decode_str(text)
+
+    monkeypatch.setattr(lint_pool, "decode_str", counting_decode)
+    lint_pool.lint_regions(template, regions)
+
+    assert len(calls) == 1
+
+
+def test_lint_regions_merges_findings():
+    matches = lint_pool.lint_regions(template, regions)
+
+    #the unused parameter does not depend on the region, it is reported once without regions
+    [unused] = matches_of(matches, "W2001")
+    assert unused.path == ["Parameters", "Unused"]
+    assert unused.regions is None
+
+    #the property schemas are regional, the finding of both regions is merged
+    [unknown] = matches_of(matches, "E3002")
+    assert unknown.regions == list(regions)
+    assert (unknown.line, unknown.column) == (0, template.index('"Unknown"'))
+
+
+def test_lint_regions_matches_one_lint_per_region():
+    def keys(matches):
+        return {(tuple(match.path), match.message, match.rule.id) for match in matches}
+
+    merged = lint_pool.lint_regions(template, regions)
+    per_region = set()
+    for region in regions:
+        per_region |= keys(lint_pool.lint(template, (region,)))
+
+    assert keys(merged) == per_region
+
+
+def test_lint_regions_with_selection():
+    selection = lint_pool.rule_selection(rules=["W2001"])
+    matches = lint_pool.lint_regions(template, regions, selection)
+
+    assert [match.rule.id for match in matches] == ["W2001"]
+
+
+def test_decode_errors_are_raised():
+    with pytest.raises(lint_pool.TemplateDecodeError):
+        lint_pool.lint_regions('{"Resources": {"A": 1, "A": 2}}', regions)
+
+
+#targeted lints
+
+def test_selection_leaves_the_full_rule_set_unchanged():
+    all_rules = lint_pool._lint_rules().data
+    child_rules = {rule_id: dict(rule.child_rules) for rule_id, rule in all_rules.items()}
+    full = lint_pool.lint(template)
+
+    selection = lint_pool.rule_selection(rules=["W2001"])
+    assert [match.rule.id for match in lint_pool.lint(template, selection=selection)] == ["W2001"]
+
+    assert {rule_id: dict(rule.child_rules) for rule_id, rule in all_rules.items()} == child_rules
+    assert [match.rule.id for match in lint_pool.lint(template)] == [match.rule.id for match in full]
+
+
+#worker pool
+
+#cfn-lint rules keep state while they run, every thread lints with its own rule set
+def test_every_thread_has_its_own_rules():
+    rules = []
+    thread = threading.Thread(target=lambda: rules.append(lint_pool._lint_rules()))
+    thread.start()
+    thread.join()
+
+    assert rules[0] is not lint_pool._lint_rules()
+    assert lint_pool._lint_rules() is lint_pool._lint_rules()
+
+
+def test_inline_runs_in_the_calling_thread(monkeypatch):
+    monkeypatch.setattr(config, "LINT_POOL_SIZE", 2)
+
+    def no_executor():
+        raise AssertionError("the pool was used")
+
+    monkeypatch.setattr(lint_pool, "get_executor", no_executor)
+
+    with lint_pool.inline():
+        assert lint_pool.submit(threading.get_ident).result() == threading.get_ident()
+
+        #an error of the job is raised by the future, like on the pool
+        future = lint_pool.submit(lint_pool.decode_template, "[1]")
+        with pytest.raises(lint_pool.TemplateDecodeError):
+            future.result()
+
+    with pytest.raises(AssertionError):
+        lint_pool.submit(threading.get_ident)
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+
+import pytest
+
+import result_store
+from result_store import ResultStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(result_store.time, "time", lambda: now[0])
+    return now
+
+
+def keys_of(store):
+    with sqlite3.connect(store.path) as connection:
+        return {key for key, in connection.execute("SELECT key FROM results")}
+
+
+def test_get_and_put(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"), 10, 30)
+    store.put("a", "{}")
+
+    assert store.get("a") == "{}"
+    assert store.get_many(["a", "b"]) == {"a": "{}"}
+
+
+def test_disabled_store(tmp_path):
+    store = ResultStore("", 10, 30)
+    store.put("a", "{}")
+
+    assert not store.enabled
+    assert store.get("a") is None
+
+
+def test_relative_path_is_resolved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ResultStore("store/results.sqlite", 10, 30)
+    monkeypatch.chdir(os.sep)
+    store.put("a", "{}")
+
+    assert store.path == str(tmp_path / "store" / "results.sqlite")
+    assert (tmp_path / "store" / "results.sqlite").is_file()
+
+
+#the least recently used rows beyond max_entries are pruned
+def test_prune_keeps_the_newest_entries(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(result_store, "prune_every_writes", 1)
+    store = ResultStore(str(tmp_path / "results.sqlite"), 3, 30)
+
+    for key in "abcd":
+        clock[0] += 1
+        store.put(key, "{}")
+    assert keys_of(store) == {"b", "c", "d"}
+
+    #reading a row marks it as used
+    clock[0] += 1
+    store.get("b")
+    clock[0] += 1
+    store.put("e", "{}")
+    assert keys_of(store) == {"b", "d", "e"}
+
+
+def test_prune_on_open(tmp_path, monkeypatch, clock):
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(path, 10, 1)
+    store.put("old", "{}")
+    clock[0] += 3600
+    store.put("recent", "{}")
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE results SET fingerprint = 'other rules' WHERE key = 'recent'")
+
+    #a day later the old row is too old and the recent one was written by other rules
+    clock[0] += 24 * 3600 - 60
+    store.put("new", "{}")
+    reopened = ResultStore(path, 10, 1)
+
+    assert reopened.get_many(["old", "recent", "new"]) == {"new": "{}"}
+    assert keys_of(reopened) == {"new"}
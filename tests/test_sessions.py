@@ -0,0 +1,194 @@
+import copy
+import json
+
+import pytest
+
+from json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch
+from QuickScan import threat_check
+from sessions import ScanSession
+
+
+#RFC 6902 operations
+
+def test_add_object_member_and_array_items():
+    document = {"a": {"b": 1}, "list": [1, 2]}
+    patched = apply_patch(document, [
+        {"op": "add", "path": "/a/c", "value": 2},
+        {"op": "add", "path": "/list/1", "value": 9},
+        {"op": "add", "path": "/list/-", "value": 3},
+    ])
+
+    assert patched == {"a": {"b": 1, "c": 2}, "list": [1, 9, 2, 3]}
+    #the original document is untouched
+    assert document == {"a": {"b": 1}, "list": [1, 2]}
+
+
+def test_remove_and_replace():
+    document = {"a": 1, "b": [1, 2, 3]}
+    patched = apply_patch(document, [
+        {"op": "remove", "path": "/a"},
+        {"op": "remove", "path": "/b/0"},
+        {"op": "replace", "path": "/b/1", "value": 7},
+    ])
+
+    assert patched == {"b": [2, 7]}
+
+
+def test_move_and_copy():
+    document = {"a": {"x": [1]}, "b": {}}
+    patched = apply_patch(document, [
+        {"op": "copy", "from": "/a/x", "path": "/b/y"},
+        {"op": "move", "from": "/a/x", "path": "/b/z"},
+    ])
+
+    assert patched == {"a": {}, "b": {"y": [1], "z": [1]}}
+    #the copy is not shared with the moved value
+    patched["b"]["y"].append(2)
+    assert patched["b"]["z"] == [1]
+
+
+def test_move_into_own_child_is_rejected():
+    with pytest.raises(JsonPatchError):
+        apply_patch({"a": {"b": {}}}, [{"op": "move", "from": "/a", "path": "/a/b/c"}])
+
+
+def test_test_operation():
+    document = {"a": [1, {"b": "c"}]}
+    assert apply_patch(document, [{"op": "test", "path": "/a/1", "value": {"b": "c"}}]) == document
+
+    with pytest.raises(JsonPatchTestFailed):
+        apply_patch(document, [{"op": "test", "path": "/a/0", "value": 2}])
+
+
+#booleans and numbers are different json types, integers and floats are the same numbers
+@pytest.mark.parametrize("value, expected, equal", [
+    (True, 1, False),
+    (1, True, False),
+    (False, 0, False),
+    ([True], [1], False),
+    ({"a": 0}, {"a": False}, False),
+    (None, False, False),
+    (1, 1.0, True),
+    ({"a": [1, {"b": 2.0}]}, {"a": [1.0, {"b": 2}]}, True),
+    (True, True, True),
+])
+def test_test_operation_types(value, expected, equal):
+    document = {"a": value}
+    operation = {"op": "test", "path": "/a", "value": expected}
+
+    if equal:
+        assert apply_patch(document, [operation]) == document
+    else:
+        with pytest.raises(JsonPatchTestFailed):
+            apply_patch(document, [operation])
+
+
+def test_escaped_tokens():
+    document = {"a/b": 1, "m~n": 2}
+    patched = apply_patch(document, [
+        {"op": "replace", "path": "/a~1b", "value": 3},
+        {"op": "replace", "path": "/m~0n", "value": 4},
+        {"op": "add", "path": "/~01", "value": 5},
+    ])
+
+    assert patched == {"a/b": 3, "m~n": 4, "~1": 5}
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "remove", "path": "/missing"},
+    {"op": "replace", "path": "/list/5", "value": 1},
+    {"op": "add", "path": "/list/01", "value": 1},
+    {"op": "add", "path": "no-slash", "value": 1},
+    {"op": "add", "path": "/a"},
+    {"op": "unknown", "path": "/a"},
+])
+def test_invalid_operations(operation):
+    document = {"list": [1]}
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [operation])
+    assert document == {"list": [1]}
+
+
+def test_failed_patch_leaves_document_untouched():
+    document = {"a": {"b": 1}}
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": "replace", "path": "/a/b", "value": 2}, {"op": "remove", "path": "/x"}])
+    assert document == {"a": {"b": 1}}
+
+
+#sessions: the report after every patch is the report of a full quick scan
+
+template = {
+    "Resources": {
+        "Bucket": {"Type": "AWS::S3::Bucket", "Properties": {"AccessControl": "PublicRead"}},
+        "Vpc": {"Type": "AWS::EC2::VPC", "Properties": {"CidrBlock": "10.0.0.0/16"}},
+        "Group": {
+            "Type": "AWS::EC2::SecurityGroup",
+            "Properties": {
+                "GroupDescription": "ssh",
+                "VpcId": {"Ref": "Vpc"},
+                "SecurityGroupIngress": [{"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "CidrIp": "0.0.0.0/0"}],
+            },
+        },
+        "Role": {
+            "Type": "AWS::IAM::Role",
+            "Properties": {"Policies": [{"PolicyName": "all", "PolicyDocument": {
+                "Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}]}}]},
+        },
+    }
+}
+
+bucket = {"Type": "AWS::S3::Bucket", "Properties": {"AccessControl": "PublicRead"}}
+flow_log = {"Type": "AWS::EC2::FlowLog", "Properties": {"ResourceId": {"Ref": "Vpc"}, "TrafficType": "ALL"}}
+
+patches = [
+    [{"op": "replace", "path": "/Resources/Bucket/Properties/AccessControl", "value": "Private"}],
+    #the flow log changes the findings of the vpc it points to
+    [{"op": "add", "path": "/Resources/FlowLog", "value": flow_log}],
+    [{"op": "replace", "path": "/Resources/Group/Properties/SecurityGroupIngress/0/CidrIp", "value": "10.0.0.0/8"}],
+    [{"op": "add", "path": "/Resources/Vpc2", "value": {"Type": "AWS::EC2::VPC", "Properties": {}}}],
+    [{"op": "replace", "path": "/Resources/FlowLog/Properties/ResourceId/Ref", "value": "Vpc2"}],
+    [{"op": "copy", "from": "/Resources/Role", "path": "/Resources/Role2"}],
+    [{"op": "move", "from": "/Resources/Bucket", "path": "/Resources/Bucket2"}],
+    [{"op": "remove", "path": "/Resources/FlowLog"}],
+    [{"op": "remove", "path": "/Resources/Role/Properties/Policies/0"}],
+    #a resource whose type changes keeps its place among the resources of its new type
+    [{"op": "replace", "path": "/Resources/Vpc", "value": bucket}],
+    [{"op": "replace", "path": "/Resources", "value": {"Only": {"Type": "AWS::S3::Bucket"}}}],
+]
+
+
+def test_report_after_patches_matches_full_scan():
+    session = ScanSession(copy.deepcopy(template))
+    assert session.report() == json.loads(threat_check(template))
+
+    expected_template = copy.deepcopy(template)
+    for operations in patches:
+        session.apply(operations)
+        expected_template = apply_patch(expected_template, operations)
+
+        assert session.template == expected_template
+        assert session.report() == json.loads(threat_check(expected_template))
+
+
+def test_failed_test_operation_keeps_the_session():
+    session = ScanSession(copy.deepcopy(template))
+    report = session.report()
+
+    with pytest.raises(JsonPatchTestFailed):
+        session.apply([
+            {"op": "remove", "path": "/Resources/Bucket"},
+            {"op": "test", "path": "/Resources/Vpc/Type", "value": "AWS::S3::Bucket"},
+        ])
+
+    assert session.template == template
+    assert session.report() == report
+
+
+#rules that read several resources of a type see them in template order after a patch
+def test_patched_resource_keeps_its_place_in_the_index():
+    session = ScanSession(copy.deepcopy(template))
+    session.apply([{"op": "add", "path": "/Resources/Bucket2", "value": bucket}])
+    session.apply([{"op": "replace", "path": "/Resources/Bucket/Properties/AccessControl", "value": "Private"}])
+
+    assert list(session.resource_index.get(["AWS::S3::Bucket"])) == ["Bucket", "Bucket2"]
@@ -0,0 +1,70 @@
+import pytest
+
+from template_parser import NotATemplateError, TemplateParseError, build_line_index, parse_template
+
+
+yaml_template = """\
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: !Ref Name
+      Tags:
+        - Key: arn
+          Value: !GetAtt Role.Arn
+"""
+
+
+def test_json_and_yaml_templates():
+    assert parse_template('{"Resources": {"Bucket": {"Type": "AWS::S3::Bucket"}}}') == {
+        "Resources": {"Bucket": {"Type": "AWS::S3::Bucket"}}}
+
+    #the short form intrinsic functions become their long form
+    properties = parse_template(yaml_template)["Resources"]["Bucket"]["Properties"]
+    assert properties["BucketName"] == {"Ref": "Name"}
+    assert properties["Tags"][0]["Value"] == {"Fn::GetAtt": ["Role", "Arn"]}
+
+
+def test_legacy_resource_key():
+    assert parse_template('{"Resource": {}}') == {"Resource": {}}
+
+
+def test_yaml_marks():
+    line_index = build_line_index(yaml_template)
+
+    assert line_index.position("/Resources/Bucket") == (2, 4)
+    assert line_index.position("/Resources/Bucket/Properties/BucketName") == (4, 18)
+    #the pointer inside a short form function has the position of the tag
+    assert line_index.position("/Resources/Bucket/Properties/BucketName/Ref") == (4, 18)
+    assert line_index.position("/Resources/Bucket/Properties/Tags/0/Value/Fn::GetAtt") == (7, 17)
+    assert line_index.lookup("/Resources/Missing") == "not found"
+
+
+def test_json_marks():
+    line_index = build_line_index('{\n  "Resources": {\n    "Bucket": {"Type": "AWS::S3::Bucket"}\n  }\n}')
+
+    assert line_index.position("/Resources/Bucket/Type") == (2, 23)
+
+
+@pytest.mark.parametrize("text", [
+    '{"Resources": ',
+    "Resources: [unclosed",
+])
+def test_invalid_templates(text):
+    with pytest.raises(TemplateParseError):
+        parse_template(text)
+
+
+@pytest.mark.parametrize("text", [
+    "[1, 2]",
+    "just text",
+    '{"AWSTemplateFormatVersion": "2010-09-09"}',
+    '{"Resources": []}',
+])
+def test_not_a_template(text):
+    with pytest.raises(NotATemplateError):
+        parse_template(text)
+
+
+def test_broken_yaml_has_an_empty_line_index():
+    assert build_line_index("Resources: [unclosed").positions == {}
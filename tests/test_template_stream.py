@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+
+from QuickScan import threat_check, threat_check_resources
+from template_stream import TemplateStreamError, iter_resources
+
+
+template = {
+    "AWSTemplateFormatVersion": "2010-09-09",
+    "Parameters": {"Name": {"Type": "String", "Default": "a \"quoted\" name"}},
+    "Resources": {
+        "Bucket": {"Type": "AWS::S3::Bucket", "Properties": {"AccessControl": "PublicRead", "Tags": []}},
+        "Vpc": {"Type": "AWS::EC2::VPC", "Properties": {"CidrBlock": "10.0.0.0/16"}},
+        "Group": {
+            "Type": "AWS::EC2::SecurityGroup",
+            "Properties": {
+                "GroupDescription": "café ☃",
+                "SecurityGroupIngress": [{"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "CidrIp": "0.0.0.0/0"}],
+            },
+        },
+        "Volume": {"Type": "AWS::EC2::Volume", "Properties": {"Size": 1.5e3, "Encrypted": False, "Iops": -12.25}},
+        "Vpc2": {"Type": "AWS::EC2::VPC", "Properties": {}},
+        "FlowLog": {"Type": "AWS::EC2::FlowLog", "Properties": {"ResourceId": {"Ref": "Vpc2"}, "TrafficType": "ALL"}},
+        "Count": 42,
+    },
+    "Outputs": {"Id": {"Value": {"Ref": "Bucket"}}},
+}
+
+
+#the reader must give the same resources wherever the chunks cut the text
+@pytest.mark.parametrize("text", [json.dumps(template), json.dumps(template, indent=2, ensure_ascii=False)])
+def test_resources_on_every_chunk_boundary(text):
+    body = text.encode()
+    for chunk_size in range(1, 48):
+        resources = list(iter_resources(io.BytesIO(body), chunk_size))
+        assert resources == list(template["Resources"].items()), chunk_size
+
+
+def test_template_without_resources():
+    assert list(iter_resources(io.BytesIO(b'{"Parameters": {}}'))) == []
+    assert list(iter_resources(io.BytesIO(b'{}'))) == []
+
+
+@pytest.mark.parametrize("body", [
+    b'[{"Resources": {}}]',
+    b'{"Resources": {"A": {"Type": tru}}}',
+    b'{"Resources": {"A" {"Type": "x"}}}',
+    b'{"Resources": {"A": {"Type": "x"}',
+    b'{"Resources": {"A": {"Type": "unterminated}}}',
+    b'',
+])
+def test_invalid_templates(body):
+    with pytest.raises(TemplateStreamError):
+        list(iter_resources(io.BytesIO(body), 4))
+
+
+class CountingStream(io.BytesIO):
+
+    def __init__(self, body):
+        super().__init__(body)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+#invalid json fails where it is read, the rest of a big body is never read
+def test_invalid_json_fails_early():
+    body = b'{"Resources": {"A": {"Type": nope, "Properties": {}}, ' + b'"Pad": "' + b"x" * 8 * 1024 * 1024 + b'"}}'
+    stream = CountingStream(body)
+
+    with pytest.raises(TemplateStreamError):
+        list(iter_resources(stream))
+    assert stream.bytes_read < 1024 * 1024
+
+
+#the streamed quick scan, custom rules included, reports the findings of the full scan
+def test_stream_findings_match_the_full_scan():
+    resources = {name: value for name, value in template["Resources"].items() if isinstance(value, dict)}
+    body = json.dumps({"Resources": resources}).encode()
+
+    streamed = json.loads(threat_check_resources(iter_resources(io.BytesIO(body), 64)))
+
+    assert streamed == json.loads(threat_check({"Resources": resources}))
+    #the vpc without a flow log is reported, the one with a flow log is not
+    assert streamed["AWS::EC2::VPC"] == [{"W13": "Medium"}]
@@ -1,75 +1,123 @@
-import os
-import shutil
+import hashlib
 import json
+import re
 import json_source_map
+from functools import lru_cache
 from pathlib import Path
 
+import config
+
+
+#keywords that decide the severity of a rule, the levels are checked in this order
+default_severity_keywords = {
+    "High": ["open", "public", "*", "0.0.0.0", "ssh", "rdp", "internet", "admin",
+             "fromport", "toport", "master", "password", "protection"],
+
+    "Medium": ["encryption", "unencrypted", "policy", "role", "privilege",
+               "logging", "audit", "kms", "encrypted", "group", "az", "property", "policies"],
+
+    "Low": ["naming", "tag", "versioning", "backup", "idle", "default", "description",
+            "engine", "0", "1", "2", "listelement"],
+}
+
+#(level, compiled pattern) pairs built by configure_severity_keywords
+severity_patterns = []
+severity_table_fingerprint = ""
+
+
+#compile one matcher per severity level, called at import and whenever the table changes
+def configure_severity_keywords(table):
+    global severity_patterns, severity_table_fingerprint
+
+    patterns = []
+    for level, keywords in table.items():
+        #longest keywords first so the alternation never stops on a shorter prefix
+        ordered = sorted({keyword.lower() for keyword in keywords}, key=len, reverse=True)
+        if ordered:
+            patterns.append((level, re.compile("|".join(re.escape(keyword) for keyword in ordered))))
+
+    severity_patterns = patterns
+    severity_table_fingerprint = hashlib.sha256(json.dumps(table, sort_keys=True).encode()).hexdigest()
+    severity_evaluation.cache_clear()
+
+
+def load_severity_keywords(file_path):
+    with open(Path(file_path), "r") as f:
+        return json.load(f)
+
 
 #function to evaluate the severity of the rule
+@lru_cache(maxsize=4096)
 def severity_evaluation(rule):
-    high_severity = {"open", "public", "*", "0.0.0.0", "ssh", "rdp", "internet", "admin",
-                    "fromport", "toport", "master", "password", "protection"}
+    rule_lower = rule.lower()
 
-    medium_severity = {"encryption", "unencrypted", "policy", "role", "privilege",
-                    "logging", "audit", "kms", "encrypted", "group", "az", "property", "policies"}
+    for level, pattern in severity_patterns:
+        if pattern.search(rule_lower):
+            return level
 
-    low_severity = {"naming", "tag", "versioning", "backup", "idle", "default", "description",
-                "engine", "0", "1", "2", "listelement"}
+    return None
 
-    rule_lower = rule.lower()
-    #check for high severity keywords
-    if any(keyword in rule_lower for keyword in high_severity):
-        return "High"
-    #check for medium severity keywords
-    if any(keyword in rule_lower for keyword in medium_severity):
-        return "Medium"
-    #check for low severity keywords
-    if any(keyword in rule_lower for keyword in low_severity):
-        return "Low"
 
+#index of the json pointers of a template, built once per scan so every lookup is a dict hit
+class LineIndex:
+
+    def __init__(self, positions):
+        #json pointer -> (line, column), both zero based like json_source_map
+        self.positions = positions
 
-#function to create a folder if not exist and put inside the json file to be parsed to lint
-def save_file(raw_data):
-    os.makedirs("user_data", exist_ok=True)
+    @classmethod
+    def from_text(cls, the_json):
+        try:
+            source_map = json_source_map.calculate(the_json)
+        except Exception:
+            return cls({})
 
-    #define the path for the file
-    second_file_name = os.path.join("user_data", "line_mapping.json")
+        positions = {
+            pointer: (entry.value_start.line, entry.value_start.column)
+            for pointer, entry in source_map.items()
+        }
+        return cls(positions)
 
-    try:
-        with open(second_file_name, "w")as secondfile:
-            secondfile.write(raw_data)
+    @classmethod
+    def from_file(cls, data):
+        with open(Path(data), "r") as f:
+            return cls.from_text(f.read())
 
-    except Exception as e:
-        print("Exception occurred while writing the file")
+    #(line, column) of the pointer or None when it is not in the template
+    def position(self, match_path):
+        return self.positions.get(match_path)
 
+    def lookup(self, match_path):
+        position = self.positions.get(match_path)
+        if position is None:
+            return "not found"
 
-#function to delete the created folder once utilized
-def delete_folder():
-    folder_path = "./user_data"
+        line, column = position
+        return f"{line + 1}:{column}"
 
-    try:
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
-    except Exception:
-        print("Something get wrong while deleting the folder")
 
 #function to calculate the line of the issue in the json
+#data can be an already built LineIndex or the path of the json file
 def find_line(data, match_path):
 
-    file_path = Path(data)
+    if not isinstance(data, LineIndex):
+        try:
+            data = LineIndex.from_file(data)
+        except OSError:
+            return "not found"
 
-    with open(file_path, "r") as f:
-        the_json = f.read()
+    return data.lookup(match_path)
 
-    try:
-        source_map = json_source_map.calculate(the_json)
 
-        line = source_map[match_path].value_start.line
-        column = source_map[match_path].value_start.column
+#name of the property a match refers to, list indexes are grouped under the same name
+def match_property_name(match):
+    if len(match.path) < 4:
+        return "UnknownProperty"
 
-        return f"{line + 1}:{column}"
-    except Exception:
-        return "not found"
+    if type(match.path[3]) == int:
+        return "ListElementType"
+
+    return str(match.path[3])
 
 
 def create_path_for_coordinate_resources(matches):
@@ -77,3 +125,10 @@ def create_path_for_coordinate_resources(matches):
     final_result = '/' + '/'.join(string_matches)
 
     return final_result
+
+
+#the severity table can be replaced with a json file mapping each level to its keywords
+if config.SEVERITY_KEYWORDS_FILE:
+    configure_severity_keywords(load_severity_keywords(config.SEVERITY_KEYWORDS_FILE))
+else:
+    configure_severity_keywords(default_severity_keywords)
@@ -5,4 +5,8 @@ import tailwindcss from '@tailwindcss/vite'
 // https://vite.dev/config/
 export default defineConfig({
   plugins: [react(), tailwindcss()],
+  build: {
+    // dist/.vite/manifest.json lists the hashed files, the server caches them as immutable
+    manifest: true,
+  },
 })
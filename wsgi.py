@@ -0,0 +1,26 @@
+import config
+import lint_pool
+import static_assets
+from main import app
+
+
+#production entry point, python3 wsgi.py serves the api with waitress.
+#the app can also be served by any wsgi server, e.g. waitress-serve wsgi:app
+#
+#the server needs more threads than the scans admitted at once plus the requests waiting
+#for a slot, otherwise the waiting requests are queued by the server instead of admission.py
+
+if __name__ == "__main__":
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    lint_pool.start()
+    static_assets.frontend_assets(app.static_folder)
+
+    if serve is None:
+        print("waitress is not installed (pip install waitress), using the Flask server")
+        app.run(host=config.SERVER_HOST, port=config.SERVER_PORT, threaded=True)
+    else:
+        serve(app, host=config.SERVER_HOST, port=config.SERVER_PORT, threads=config.SERVER_THREADS)